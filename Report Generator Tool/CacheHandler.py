@@ -0,0 +1,127 @@
+#------------------------------------------------------------------------------------------#
+# Author: Adil Zafar Khan
+# Last Edit Date: 12/22/2021
+# Description:
+"""
+    CacheHandler keeps the values of the ETAP study sheets that have been read in a cache
+    directory, so the INT, MOM and SWT reports of a run and the next runs do not open and
+    parse the same study files again. A sheet is used from the cache as long as the path,
+    size and modification time of its file have not changed. Only the first columns that the
+    reports copy are kept, a sheet is read again with more columns when a report needs them.
+    The cache size is bounded and the least recently used sheets are removed first.
+"""
+#------------------------------------------------------------------------------------------#
+
+#Import required libraries
+import os
+import gzip
+import pickle
+import hashlib
+from pathlib import Path
+
+#Cache of the values of study sheets, every sheet is a compressed file named after a hash of the path of its study file
+#The time a cache file was last used is its modification time
+class StudyCache:
+
+    #Version of the cache file format, files of another version are ignored
+    version = 2
+
+    #Keys every cache file has, a file without them is damaged
+    keys = {'version', 'stamp', 'rows', 'maxRow', 'maxColumn', 'columns'}
+
+    #Initialize class
+    def __init__(self, dirPath, maxSize = 256 * 1024 * 1024):
+
+        self.dirPath = Path(dirPath)
+        self.maxSize = maxSize
+        self.dirPath.mkdir(parents = True, exist_ok = True)
+
+    #Returns the path of the cache file of a study file
+    def getCachePath(self, path):
+
+        name = hashlib.blake2b(str(Path(path).resolve()).encode('utf-8'), digest_size = 20).hexdigest()
+        return Path(self.dirPath, name + '.studycache')
+
+    #Returns the size and modification time of a study file, a sheet is only used from the cache if both are the same
+    def getFileStamp(self, path):
+
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    #Returns (rows, maxRow, maxColumn, columns) of the sheet of a study file, rows is a list of the values of the first
+    #columns of every row
+    #Returns None if the sheet is not in the cache or the study file has changed since it was cached
+    def loadSheet(self, path):
+
+        cachePath = self.getCachePath(path)
+        if not cachePath.exists():
+            return None
+
+        try:
+            with gzip.open(cachePath, 'rb') as cacheFile:
+                data = pickle.load(cacheFile)
+            if not isinstance(data, dict) or not self.keys <= data.keys():
+                raise ValueError("Unknown cache file format")
+
+        #Any error means the file is damaged, it is removed and the study file is read again and cached over it
+        except Exception:
+            try:
+                os.remove(cachePath)
+            except OSError:
+                pass
+            return None
+
+        if data['version'] != self.version or data['stamp'] != self.getFileStamp(path):
+            return None
+
+        #Mark the file as recently used, another instance may have evicted it in the meantime
+        try:
+            os.utime(cachePath)
+        except FileNotFoundError:
+            pass
+
+        return data['rows'], data['maxRow'], data['maxColumn'], data['columns']
+
+    #Saves the first columns of the sheet of a study file to the cache and removes the least recently used sheets if the
+    #cache is too big
+    def saveSheet(self, path, rows, maxRow, maxColumn, columns):
+
+        cachePath = self.getCachePath(path)
+        data = {'version': self.version, 'stamp': self.getFileStamp(path), 'rows': rows, 'maxRow': maxRow,
+                'maxColumn': maxColumn, 'columns': columns}
+
+        #Write to a temporary file first so a cache file is never left half written
+        tempPath = Path(str(cachePath) + '.' + str(os.getpid()) + '.tmp')
+        with gzip.open(tempPath, 'wb', compresslevel = 1) as cacheFile:
+            pickle.dump(data, cacheFile, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tempPath, cachePath)
+        self.evictFiles()
+
+    #Removes the least recently used cache files until the cache fits in maxSize
+    def evictFiles(self):
+
+        entries = []
+        for cachePath in self.dirPath.glob('*.studycache'):
+
+            #The file may have been evicted by another instance since it was listed
+            try:
+                stat = cachePath.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, cachePath))
+
+        #Oldest first
+        entries.sort()
+        total = sum(entry[1] for entry in entries)
+
+        for mtime, size, cachePath in entries:
+            if total <= self.maxSize:
+                break
+
+            #The file is already gone or, on Windows, still open in another instance
+            try:
+                os.remove(cachePath)
+            except OSError:
+                continue
+            total -= size
@@ -21,6 +21,8 @@ from win32com import client
 from tkinter import messagebox
 from PdfHandler import PdfHandler
 from DocHandler import DataImporter
+from CacheHandler import StudyCache
+from ExcelHandler import ReportsTableHandler
 from ExcelGenerator import IntReport, MomReport, SwitchReport, ArcFlashReport
 from PdfGenerator import TCCGraphs, HalfCycleReports, RefInfo, FinalReport
 
@@ -86,6 +88,10 @@ class ClassBuilder:
 
         #________INITIALIZE CLASS OBJECTS________#
 
+        #Share one cache of the study sheets between all the reports and keep it for the next runs
+        ReportsTableHandler.studyCache = StudyCache(Path(os.environ.get('LOCALAPPDATA', Path.home()),
+                                                         "Report Generator Tool", "Study Cache"))
+
         #Initialize INT Reports object
         self.intReport = IntReport()
 
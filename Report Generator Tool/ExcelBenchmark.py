@@ -0,0 +1,297 @@
+#------------------------------------------------------------------------------------------#
+# Author: Adil Zafar Khan
+# Last Edit Date: 12/22/2021
+# Description:
+"""
+    ExcelBenchmark builds a synthetic source sheet like the ETAP exports and times the column
+    transfer functions of ReportsTableHandler against the cell by cell copy they replaced, and
+    loopData against the cell by cell loopData on full read/write loads it replaced.
+    The tables built by both are compared so a faster transfer can never change a report.
+
+    Usage: python ExcelBenchmark.py [--rows 10000] [--cols 20] [--preserved-rows 1000] [--files 4] [--repeat 3]
+"""
+#------------------------------------------------------------------------------------------#
+
+#Import required libraries
+import re
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from openpyxl import Workbook
+from openpyxl import load_workbook
+from ExcelHandler import ReportsTableHandler
+
+#Values of the synthetic source cells, numbers are mostly exported as text
+sampleValues = ["0.48", "13.8", "4.16", "25", "1.2.3", "N/A", "Open", "", None, 0.75, 12, "²"]
+
+#Creates a source workbook with an ID column and numCols - 1 data columns and returns its path
+#The IDs start at firstID, so two files can share only some of their IDs like two scenarios of a study
+def createSourceFile(dirPath, numRows, numCols, seed = 0, firstID = 0, fileName = "Source.xlsx"):
+
+    r = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+
+    #Header row
+    ws.append(["ID"] + ["Column " + str(col) for col in range(2, numCols + 1)])
+
+    #Data rows, every ID is unique
+    for row in range(firstID, firstID + numRows):
+        ws.append(["Bus" + str(row)] + [r.choice(sampleValues) for col in range(numCols - 1)])
+
+    path = Path(dirPath, fileName)
+    wb.save(path)
+    return path
+
+#First empty row of the ID column as it was found before the read only loads, used as the reference
+def referenceGetFirstEmptyRowNum(sheet):
+    for row in sheet.iter_rows(min_row = 2, max_col = 1, max_row = sheet.max_row):
+        for cell in row:
+            if cell.value == None:
+                return cell.row
+
+    return sheet.max_row
+
+#Row after the last copied row as it was found before the bulk transfer, used as the reference
+def referenceLastRowNum(sheet, numRows = False):
+    if not numRows:
+        return sheet.max_row + 1
+
+    return referenceGetFirstEmptyRowNum(sheet) + 1
+
+#Column of a header as it was found before the read only loads, used as the reference
+def referenceGetColumnByHeaderName(sheet, name, headerRowNum = 1):
+    for col in range(1, sheet.max_column + 1):
+        if re.search(name, str(sheet.cell(row = headerRowNum, column = col).value)) != None:
+            return col
+
+    return 1
+
+#Cell by cell copy of transferColumns as it was before the bulk transfer, used as the reference
+def referenceTransfer(handler, sheet, dRow, dCol, sRow, sCol, numCols, numRows = False):
+
+    lastRow = referenceLastRowNum(sheet, numRows)
+    counterRow = 0
+
+    for row in range(sRow, lastRow):
+        for counterCol, col in enumerate(range(sCol, sCol + numCols)):
+
+            handler.ws.cell(row = dRow + counterRow, column = dCol + counterCol).value = sheet.cell(row = row, column = col).value
+            try:
+                if (handler.ws.cell(row = dRow + counterRow, column = dCol + counterCol).value.replace('.','').isnumeric()):
+                    numericVal = float(handler.ws.cell(row = dRow + counterRow, column = dCol + counterCol).value)
+                    handler.ws.cell(row = dRow + counterRow, column = dCol + counterCol).value = numericVal
+            except:
+                pass
+
+        counterRow += 1
+
+#Linear ID lookup of matchIDs as it was before the ID index, used as the reference
+def referenceMatchIDs(handler, ID, sRow):
+    for i in range(sRow, handler.ws.max_row + 1):
+        if handler.ws.cell(row = i, column = 1).value == ID:
+            return i
+
+    return handler.ws.max_row + 1
+
+#Cell by cell copy of transferColumnsPreserved as it was before the bulk transfer, used as the reference
+def referenceTransferPreserved(handler, sheet, dRow, dCol, sRow, sCol, numCols, numRows = False):
+
+    idRow = dRow
+    lastRow = referenceLastRowNum(sheet, numRows)
+
+    for row in range(sRow, lastRow):
+        for counterCol, col in enumerate(range(sCol, sCol + numCols)):
+
+            dRow = referenceMatchIDs(handler, sheet.cell(row = row, column = 1).value, idRow)
+            handler.ws.cell(row = dRow, column = dCol + counterCol).value = sheet.cell(row = row, column = col).value
+            try:
+                if (handler.ws.cell(row = dRow, column = dCol + counterCol).value.replace('.','').isnumeric()):
+                    numericVal = float(handler.ws.cell(row = dRow, column = dCol + counterCol).value)
+                    handler.ws.cell(row = dRow, column = dCol + counterCol).value = numericVal
+            except:
+                pass
+
+#Returns the values of every cell of the destination sheet of a handler
+def tableValues(handler):
+    return [list(row) for row in handler.ws.iter_rows(values_only = True)]
+
+#Returns True if two handlers built the same table
+def sameTable(handler1, handler2):
+    return (tableValues(handler1) == tableValues(handler2) and handler1.ws.max_row == handler2.ws.max_row
+            and handler1.ws.max_column == handler2.ws.max_column)
+
+#Runs a transfer on a fresh handler and returns the handler and the time taken in seconds
+#setup(handler, sheet) prepares the destination sheet before the timed transfer
+def timeTransfer(transfer, sourcePath, setup = None):
+
+    sheet = load_workbook(sourcePath).worksheets[0]
+    handler = ReportsTableHandler()
+
+    if setup is not None:
+        setup(handler, sheet)
+
+    startTime = time.perf_counter()
+    transfer(handler, sheet)
+    return handler, time.perf_counter() - startTime
+
+#Times the reference and the bulk version of a transfer, best of repeat runs
+#Returns the two times and if both built the same table
+def compareTransfer(name, reference, bulk, sourcePath, repeat, setup = None):
+
+    referenceTimes = []
+    bulkTimes = []
+
+    for i in range(repeat):
+        referenceHandler, seconds = timeTransfer(reference, sourcePath, setup)
+        referenceTimes.append(seconds)
+        bulkHandler, seconds = timeTransfer(bulk, sourcePath, setup)
+        bulkTimes.append(seconds)
+
+    same = sameTable(referenceHandler, bulkHandler)
+
+    print(name + ": cell by cell " + format(min(referenceTimes), '.3f') + " s, bulk " + format(min(bulkTimes), '.3f')
+          + " s, " + format(min(referenceTimes) / max(min(bulkTimes), 1e-9), '.1f') + "x faster, same table: " + str(same))
+
+    return min(referenceTimes), min(bulkTimes), same
+
+#Copy of loopData as it was before the bulk transfer and the read only loads, used as the reference
+#Every scenario file is loaded in full read/write mode and copied cell by cell, the source files are all xlsx so the
+#xls conversion is left out
+def referenceLoopData(handler, dirPath, fileNames, dRow, dCol, sRow, sCol, hNumCols, bNumCols, numRows = False,
+                      addClosingCols = False, numFiles = None):
+
+    dRow = handler.ws.max_row - 1 + dRow
+    idCol = dCol
+    dCol += hNumCols + 1
+    hColsTransferred = False
+
+    if numFiles == None:
+        numFiles = len(fileNames)
+
+    for fileName in fileNames:
+
+        dataWb = load_workbook(Path(dirPath, fileName))
+        dataSheet = dataWb.worksheets[0]
+
+        if isinstance(sCol, str):
+            sColNum = referenceGetColumnByHeaderName(dataSheet, sCol)
+        else:
+            sColNum = sCol
+
+        if not hColsTransferred and hNumCols > 0 and dataSheet.max_column > 1:
+            referenceTransfer(handler, dataSheet, dRow, idCol, sRow, 1, hNumCols, numRows)
+            hColsTransferred = True
+        else:
+            referenceTransferPreserved(handler, dataSheet, dRow, idCol, sRow, 1, hNumCols, numRows)
+
+        referenceTransferPreserved(handler, dataSheet, dRow, dCol, sRow, sColNum, bNumCols, numRows)
+
+        if addClosingCols:
+            startLastCol = len(fileNames) * bNumCols + hNumCols + len(fileNames) + 2
+            referenceTransferPreserved(handler, dataSheet, dRow, startLastCol, sRow, hNumCols + 1, bNumCols, numRows)
+
+        dataWb.close()
+        dCol += bNumCols + 1
+
+        if fileNames.index(fileName) >= numFiles - 1:
+            break
+
+#Runs a loopData over the scenario files and returns the handler, the time taken in seconds and the peak memory
+#allocated in bytes, the memory is traced in a second run so it does not slow the timed run
+def timeLoopData(loopData, dirPath, fileNames):
+
+    handler = ReportsTableHandler()
+    startTime = time.perf_counter()
+    loopData(handler, dirPath, fileNames)
+    seconds = time.perf_counter() - startTime
+
+    tracemalloc.start()
+    try:
+        loopData(ReportsTableHandler(), dirPath, fileNames)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return handler, seconds, peak
+
+#Times the reference loopData and loopData, best of repeat runs
+#Returns the two times and if both built the same table
+def compareLoopData(name, dirPath, fileNames, repeat, **kwargs):
+
+    reference = lambda handler, dirPath, fileNames: referenceLoopData(handler, dirPath, fileNames, 3, 1, 2, "Column 6", 4, 1, **kwargs)
+    current = lambda handler, dirPath, fileNames: handler.loopData(dirPath, fileNames, 3, 1, 2, "Column 6", 4, 1, **kwargs)
+
+    referenceRuns = [timeLoopData(reference, dirPath, fileNames) for i in range(repeat)]
+    readOnlyRuns = [timeLoopData(current, dirPath, fileNames) for i in range(repeat)]
+
+    referenceSeconds = min(run[1] for run in referenceRuns)
+    readOnlySeconds = min(run[1] for run in readOnlyRuns)
+    same = sameTable(referenceRuns[0][0], readOnlyRuns[0][0])
+
+    print(name + ": cell by cell full load " + format(referenceSeconds, '.3f') + " s, " + format(referenceRuns[0][2] / 1048576, '.1f')
+          + " MB peak, read only " + format(readOnlySeconds, '.3f') + " s, " + format(readOnlyRuns[0][2] / 1048576, '.1f')
+          + " MB peak, same table: " + str(same))
+
+    return referenceSeconds, readOnlySeconds, same
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Benchmark the column transfer functions of ReportsTableHandler.")
+    parser.add_argument('--rows', type = int, default = 10000, help = "Number of data rows of the source sheet")
+    parser.add_argument('--cols', type = int, default = 20, help = "Number of columns of the source sheet")
+    parser.add_argument('--preserved-rows', type = int, default = 1000,
+                        help = "Number of data rows used for transferColumnsPreserved and loopData, the cell by cell "
+                               "copy scans the IDs for every cell so it grows with the square of the rows")
+    parser.add_argument('--files', type = int, default = 4, help = "Number of scenario files read by loopData")
+    parser.add_argument('--repeat', type = int, default = 3, help = "Number of timed runs, the best is kept")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as dirPath:
+
+        #Arc flash report: all the columns copied in one block, stopping at the first empty row
+        sourcePath = createSourceFile(dirPath, args.rows, args.cols)
+        results = [compareTransfer("transferColumns " + str(args.rows) + "x" + str(args.cols),
+                                   lambda handler, sheet: referenceTransfer(handler, sheet, 1, 1, 1, 1, args.cols, True),
+                                   lambda handler, sheet: handler.transferColumns(sheet, 1, 1, 1, 1, args.cols, True),
+                                   sourcePath, args.repeat)]
+
+        #INT and MOM reports: the first scenario gives the IDs, the header and body columns of the next scenario are
+        #matched to them, half of its IDs are new and are added at the end
+        firstPath = createSourceFile(dirPath, args.preserved_rows, args.cols, fileName = "First.xlsx")
+        sourcePath = createSourceFile(dirPath, args.preserved_rows, args.cols, seed = 1, firstID = args.preserved_rows // 2)
+        setup = lambda handler, sheet: handler.transferColumns(load_workbook(firstPath).worksheets[0], 3, 1, 2, 1, 4)
+
+        #Same order of transfers as loopData
+        def reference(handler, sheet):
+            referenceTransferPreserved(handler, sheet, 3, 1, 2, 1, 4)
+            referenceTransferPreserved(handler, sheet, 3, 6, 2, 5, args.cols - 4)
+
+        def bulk(handler, sheet):
+            handler.transferColumnsPreserved(sheet, 3, 1, 2, 1, 4)
+            handler.transferColumnsPreserved(sheet, 3, 6, 2, 5, args.cols - 4)
+
+        results.append(compareTransfer("transferColumnsPreserved " + str(args.preserved_rows) + "x" + str(args.cols),
+                                       reference, bulk, sourcePath, args.repeat, setup))
+
+        #Whole report: the header columns and one body column found by its header name from every scenario file
+        #The reference matches the IDs cell by cell like transferColumnsPreserved so it uses the same number of rows
+        fileNames = [createSourceFile(dirPath, args.preserved_rows, args.cols, seed = i, firstID = i * args.preserved_rows // 10,
+                                      fileName = "Scenario" + str(i) + ".xlsx").name for i in range(args.files)]
+        name = "loopData " + str(args.files) + " files " + str(args.preserved_rows) + "x" + str(args.cols)
+        results.append(compareLoopData(name, dirPath, fileNames, args.repeat))
+
+        #Arc flash and SWT reports stop at the first empty row and add the closing columns
+        results.append(compareLoopData(name + " closing columns", dirPath, fileNames, args.repeat, numRows = True,
+                                       addClosingCols = True))
+
+    #Return a failure exit code if any transfer built a different table
+    return 0 if all(same for referenceSeconds, bulkSeconds, same in results) else 1
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -12,18 +12,126 @@
 #Import required libraries
 import os
 import re
-import pythoncom
+import bisect
 from copy import copy
 from pathlib import Path
-import win32com.client as win32
 from openpyxl import Workbook
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import PatternFill, Border, Side, Alignment, Protection, Font, Side
 
+#Excel is only needed to convert the .xls files that xlrd cannot read, and to auto fit the columns
+try:
+    import pythoncom
+    import win32com.client as win32
+except ImportError:
+    pythoncom = win32 = None
+
+#xlrd reads Excel 97-2003 .xls files without Excel, the files are converted with Excel if it is not installed
+try:
+    import xlrd
+except ImportError:
+    xlrd = None
+
+#First bytes of an Excel 97-2003 .xls file (an OLE2 compound file)
+ole2Signature = b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1'
+
+#Excel 97-2003 .xls file read with xlrd, has the worksheets and close of an openpyxl workbook for loopData
+class XlsWorkbook:
+
+    #Initialize class
+    def __init__(self, path):
+
+        #Only the sheets that are used are loaded
+        self.book = xlrd.open_workbook(str(path), on_demand = True)
+        self.worksheets = [XlsSheet(self.book, self.book.sheet_by_index(0))]
+
+    #Releases the file of the workbook
+    def close(self):
+        self.book.release_resources()
+
+#Sheet of an .xls file with the iter_rows, max_row and max_column of a worksheet
+#The values are the ones openpyxl reads from the xlsx copy Excel saves of the sheet
+class XlsSheet:
+
+    #Initialize class
+    def __init__(self, book, sheet):
+
+        self.book = book
+        self.sheet = sheet
+
+        #An empty sheet has one row and one column, same as openpyxl
+        self.max_row = max(sheet.nrows, 1)
+        self.max_column = max(sheet.ncols, 1)
+
+    #Converts the value of a cell to the value openpyxl would read for it
+    def convertCell(self, cell):
+
+        #Blank cells and empty strings are not saved in an xlsx file
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK) or cell.value == '':
+            return None
+
+        if cell.ctype == xlrd.XL_CELL_NUMBER:
+            return int(cell.value) if cell.value.is_integer() else cell.value
+
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            return xlrd.xldate.xldate_as_datetime(cell.value, self.book.datemode)
+
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(cell.value)
+
+        if cell.ctype == xlrd.XL_CELL_ERROR:
+            return xlrd.error_text_from_code.get(cell.value)
+
+        return cell.value
+
+    #Returns the values of the rows like iter_rows of a worksheet with values_only
+    def iter_rows(self, min_row = 1, max_row = None, min_col = 1, max_col = None, values_only = True):
+
+        if max_row is None:
+            max_row = self.max_row
+        if max_col is None:
+            max_col = self.max_column
+
+        for row in range(min_row, max_row + 1):
+
+            #xlrd rows only go up to the last cell of the row
+            cells = self.sheet.row_slice(row - 1, min_col - 1, max_col) if row <= self.sheet.nrows else []
+            values = tuple(self.convertCell(cell) for cell in cells)
+            yield values + (None,) * (max_col + 1 - min_col - len(values))
+
+
+#Values of the first columns of a source sheet, read from a read only sheet in a single pass or from the study cache
+#Used by the transfer functions in place of the sheet, so the file is parsed once however many columns are copied
+class SourceSheet:
+
+    #Initialize class
+    def __init__(self, rows, maxRow, maxColumn):
+
+        self.rows = rows
+        self.max_row = maxRow
+        self.max_column = maxColumn
+
+    #Returns the values of the rows like iter_rows of a worksheet with values_only, the columns after maxCol are empty
+    def iter_rows(self, min_row = 1, max_row = None, min_col = 1, max_col = None, values_only = True):
+
+        if max_row is None:
+            max_row = self.max_row
+        if max_col is None:
+            max_col = self.max_column
+
+        for row in range(min_row, max_row + 1):
+
+            #Rows at the end of the sheet with no cells are not in the file
+            values = self.rows[row - 1][min_col - 1:max_col] if row <= len(self.rows) else ()
+            yield values + (None,) * (max_col + 1 - min_col - len(values))
+
 #Parent class for generating excel reports
 class ReportsTableHandler:
 
+    #Cache of the study sheets shared by all the reports, study files are read from disk every time if it is None
+    studyCache = None
+
     #------------------------INITIALIZING FUNCTIONS--------------------------#
 
     #Initialize class
@@ -37,6 +145,9 @@ class ReportsTableHandler:
             self.wb = load_workbook(wbPath)
             self.ws = self.wb.active
 
+        #Rows of every ID in the first column of the destination sheet, only kept while columns are transferred
+        self.idRows = None
+
     #Add a new sheet to the workbook
     def addSheet(self, sheetName = "New_Sheet"):
         newSheet = self.wb.create_sheet(sheetName)
@@ -51,11 +162,14 @@ class ReportsTableHandler:
     #Function that converts an xlx file to xlsx
     def convertToXlsx(self, path):
 
-        pythoncom.CoInitialize()
-        
         if path.suffix == '.xlsx':
             return path
 
+        if win32 == None:
+            raise RuntimeError("Excel is needed to convert " + str(path) + " to xlsx")
+
+        pythoncom.CoInitialize()
+
         #Open excel in pywin32
         excel = win32.gencache.EnsureDispatch('Excel.Application')
         wb = excel.Workbooks.Open(path)
@@ -68,6 +182,29 @@ class ReportsTableHandler:
         
         return Path(str(path) + "x")
 
+    #Checks if a file is an Excel 97-2003 .xls file that xlrd can read without Excel
+    #ETAP can also save reports as .xls files that are not workbooks, those still go through Excel
+    def isXlsWorkbook(self, path):
+
+        if xlrd == None or path.suffix != '.xls':
+            return False
+
+        with open(path, 'rb') as file:
+            return file.read(len(ole2Signature)) == ole2Signature
+
+    #Opens a source workbook, .xls files are read directly and any other file is converted to xlsx if needed
+    #and loaded in read only mode, the rows are streamed from the file
+    #Returns the workbook and the path of the file that was opened
+    def openDataWorkbook(self, path):
+
+        if self.isXlsWorkbook(path):
+            return XlsWorkbook(path), path
+
+        #Convert xls to xlsx
+        filePath = self.convertToXlsx(path)
+
+        return load_workbook(filePath, read_only = True), filePath
+
     #Creates an empty excel file at the pecified path
     def createEmptyExcelFile(self, wbPath):
 
@@ -275,117 +412,216 @@ class ReportsTableHandler:
             if i >= self.ws.max_column:
                 break
 
-    def getColumnByHeaderName(self, sheet, name, headerRowNum = 1):
-        
-        for col in range(1, sheet.max_column + 1):
+    #Returns the first column whose header matches the regex name, or default if there is none
+    def getColumnByHeaderName(self, sheet, name, headerRowNum = 1, default = 1):
+
+        #Read the header row once, a read only sheet would be parsed again for every single cell
+        header = next(sheet.iter_rows(min_row = headerRowNum, max_row = headerRowNum, values_only = True), ())
+
+        for col, value in enumerate(header, 1):
             
-            if re.search(name, str(sheet.cell(row = headerRowNum, column = col).value)) != None:
+            if re.search(name, str(value)) != None:
                 return col
 
-        return 1
+        return default
 
+    #Builds the ID index of the destination sheet, the rows of every value in the first column from sRow to the last row
+    def indexIDs(self, sRow):
+
+        self.idRows = {}
+        self.idStartRow = sRow
+        self.idLastRow = self.ws.max_row
+
+        for row, (ID,) in enumerate(self.ws.iter_rows(min_row = sRow, max_row = self.idLastRow, max_col = 1,
+                                                      values_only = True), sRow):
+            self.idRows.setdefault(ID, []).append(row)
+
+    #Returns the first row from sRow on that has the ID in the first column, or the row after the last row
     def matchIDs(self, ID, sRow):
-        for i in range(sRow, self.ws.max_row + 1):
-            if self.ws.cell(row = i, column = 1).value == ID:
-                return i
 
-        return self.ws.max_row + 1
+        #Index the IDs once instead of scanning the sheet for every cell
+        if self.idRows is None or self.idStartRow != sRow:
+            self.indexIDs(sRow)
+
+        rows = self.idRows.get(ID)
+        if rows:
+            return rows[0]
+
+        return self.idLastRow + 1
+
+    #Writes a value to the destination sheet and keeps the ID index up to date
+    def writeIndexedCell(self, row, column, value):
+
+        cell = self.ws.cell(row = row, column = column)
+
+        #A new row is added at the end, its ID stays empty until the first column is written
+        if row > self.idLastRow:
+            self.idLastRow = row
+            if row >= self.idStartRow:
+                bisect.insort(self.idRows.setdefault(None, []), row)
+
+        #Move the row to its new ID if the first column changes
+        if column == 1 and row >= self.idStartRow and cell.value != value:
+            self.idRows[cell.value].remove(row)
+            bisect.insort(self.idRows.setdefault(value, []), row)
+
+        cell.value = value
+
+    #Converts a copied value to a float if it is a numeric string, any other value is returned as it is
+    def convertValue(self, value):
+
+        #If it is a number
+        if isinstance(value, str) and value.replace('.','').isnumeric():
+
+            #Strings like "1.2.3" pass the check but are not numbers, they are kept as strings
+            try:
+                return float(value)
+            except ValueError:
+                pass
+
+        return value
+
+    #Returns the row after the last row to be copied from the source sheet
+    def getLastRowNum(self, sheet, numRows = False):
 
-    def transferColumnsPreserved(self, sheet, dRow, dCol, sRow, sCol, numCols, numRows = False):
-        
-        idRow = dRow
         #If numRows is not passed
         if not numRows:
 
             #Set the last row as the last filled row in the source excel sheet
-            lastRow = sheet.max_row + 1
-            
-        else:
-            
-            #Set the last row as the position of the first empty row
-            lastRow = self.getFirstEmptyRowNum(sheet) + 1
+            return sheet.max_row + 1
 
-        #Last column position = starting column + number of columns
-        lastCol = sCol + numCols
-        
-        #Counters for counting through cells
-        counterCol = 0
-        
-        #Loop through each cell in the range of start row, start column and last row, last column of the source sheet
-        for row in range(sRow, lastRow):
-            for col in range(sCol, lastCol):
+        #Set the last row as the position of the first empty row
+        return self.getFirstEmptyRowNum(sheet) + 1
 
-                dRow = self.matchIDs(sheet.cell(row = row, column = 1).value, idRow)
-                #Copy and paste the content in the cell to the counters + starting position 
-                self.ws.cell(row = dRow, column = dCol + counterCol).value = sheet.cell(row = row, column = col).value
+    #Reads numCols columns of the source sheet from sRow up to lastRow in a single pass
+    #Returns a list of converted values for every row
+    def readColumns(self, sheet, sRow, lastRow, sCol, numCols):
 
-                #Convert to numbers
-                try:
+        rows = sheet.iter_rows(min_row = sRow, max_row = lastRow - 1, min_col = sCol, max_col = sCol + numCols - 1,
+                               values_only = True)
 
-                    #If it is a number
-                    if (self.ws.cell(row = dRow, column = dCol + counterCol).value.replace('.','').isnumeric()):
-                        
-                        #Convert it to float and round it to two decimal places
-                        numericVal = float(self.ws.cell(row = dRow, column = dCol + counterCol).value)
-                        self.ws.cell(row = dRow, column = dCol + counterCol).value = numericVal
-                except:
-                    pass
-                
-                #Increment column counter
-                counterCol += 1
-                
-            #Reset column counter
-            counterCol = 0
+        return ([self.convertValue(value) for value in row] for row in rows)
 
+    #Reads the ID column and numCols columns of the source sheet from sRow up to lastRow in a single pass
+    #Returns the ID and a list of converted values for every row
+    def readIDColumns(self, sheet, sRow, lastRow, sCol, numCols):
+
+        rows = sheet.iter_rows(min_row = sRow, max_row = lastRow - 1, max_col = sCol + numCols - 1, values_only = True)
+
+        return ((row[0], [self.convertValue(value) for value in row[sCol - 1:]]) for row in rows)
+
+    #Copies the columns of the source sheet to the rows of the destination sheet that have the same ID in the first column
+    def transferColumnsPreserved(self, sheet, dRow, dCol, sRow, sCol, numCols, numRows = False):
+
+        idRow = dRow
+        lastRow = self.getLastRowNum(sheet, numRows)
+
+        #Nothing to copy
+        if numCols <= 0:
+            return
+
+        #Index the IDs of the destination sheet as it is now
+        self.indexIDs(idRow)
+
+        #Loop through each row of the source sheet, the ID is read together with the columns to be copied
+        for ID, values in self.readIDColumns(sheet, sRow, lastRow, sCol, numCols):
+            for counterCol, value in enumerate(values):
+
+                #Find the destination row for every cell since writing a cell can add a new row
+                dRow = self.matchIDs(ID, idRow)
+
+                #Paste the value at the row of the ID
+                self.writeIndexedCell(dRow, dCol + counterCol, value)
+
+        #The sheet can be changed by other functions from here on, so the index is not kept
+        self.idRows = None
+
+    #Copies a block of columns of the source sheet to the destination sheet starting at dRow, dCol
     def transferColumns(self, sheet, dRow, dCol, sRow, sCol, numCols, numRows = False):
 
-        #If numRows is not passed
-        if not numRows:
+        lastRow = self.getLastRowNum(sheet, numRows)
 
-            #Set the last row as the last filled row in the source excel sheet
-            lastRow = sheet.max_row + 1
-            
-        else:
-            
-            #Set the last row as the position of the first empty row
-            lastRow = self.getFirstEmptyRowNum(sheet) + 1
+        #Nothing to copy
+        if numCols <= 0:
+            return
 
-        #Last column position = starting column + number of columns
-        lastCol = sCol + numCols
-        
-        #Counters for counting through cells
-        counterCol = 0
-        counterRow = 0
-        
-        #Loop through each cell in the range of start row, start column and last row, last column of the source sheet
-        for row in range(sRow, lastRow):
-            for col in range(sCol, lastCol):
+        cell = self.ws.cell
 
-                #Copy and paste the content in the cell to the counters + starting position 
-                self.ws.cell(row = dRow + counterRow, column = dCol + counterCol).value = sheet.cell(row = row, column = col).value
+        #Paste every row of the source block at the counters + starting position
+        for counterRow, values in enumerate(self.readColumns(sheet, sRow, lastRow, sCol, numCols)):
+            for counterCol, value in enumerate(values):
+                cell(row = dRow + counterRow, column = dCol + counterCol).value = value
 
-                #Convert to numbers
-                try:
+    #Returns the first sheet of a source workbook
+    #A read only sheet takes its size from the dimension saved in the file, the size is measured if the file has none
+    def getDataSheet(self, wb):
 
-                    #If it is a number
-                    if (self.ws.cell(row = dRow + counterRow, column = dCol + counterCol).value.replace('.','').isnumeric()):
-                        
-                        #Convert it to float and round it to two decimal places
-                        numericVal = float(self.ws.cell(row = dRow + counterRow, column = dCol + counterCol).value)
-                        self.ws.cell(row = dRow + counterRow, column = dCol + counterCol).value = numericVal
-                        
-                except:
-                    pass
+        sheet = wb.worksheets[0]
+        if sheet.max_row is None or sheet.max_column is None:
+            sheet.calculate_dimension(force = True)
 
-                #Increment column counter
-                counterCol += 1
-                
-            #Reset column counter
-            counterCol = 0
-            
-            #Increment row counter
-            counterRow += 1
+        return sheet
+
+    #Returns the last column of a source sheet that loopData copies from, the header, body and closing columns
+    #Returns None if sCol is a header name that is not in the sheet and default is None
+    def getLastColumnNum(self, sheet, sCol, hNumCols, bNumCols, addClosingCols = False, default = 1):
+
+        sColNum = self.getColumnByHeaderName(sheet, sCol, default = default) if isinstance(sCol, str) else sCol
+        if sColNum == None:
+            return None
+
+        return max(hNumCols, sColNum + bNumCols - 1, hNumCols + bNumCols if addClosingCols else 1)
+
+    #Reads the first sheet of a study file into memory and closes the file
+    #Only the columns up to the last column copied are read. With a study cache the sheet is saved to the cache, so a
+    #file that has not changed is not opened again by this or any other report that copies the same or fewer columns
+    def readDataSheet(self, path, sCol, hNumCols, bNumCols, addClosingCols = False):
+
+        #Number of columns of the file in the cache
+        cachedColumns = 0
+
+        #Take the sheet from the cache if the file has not changed since it was cached
+        if self.studyCache != None:
+            cachedSheet = self.studyCache.loadSheet(path)
+            if cachedSheet != None:
+                rows, maxRow, maxColumn, cachedColumns = cachedSheet
+                sourceSheet = SourceSheet(rows, maxRow, maxColumn)
+
+                #Every column is in the cache
+                if cachedColumns >= maxColumn:
+                    return sourceSheet
 
+                #The header of sCol may be in a column that was not cached, then the file is read again
+                lastCol = self.getLastColumnNum(sourceSheet, sCol, hNumCols, bNumCols, addClosingCols, default = None)
+                if lastCol != None and lastCol <= cachedColumns:
+                    return sourceSheet
+
+        #Open the excel file
+        dataWb, filePath = self.openDataWorkbook(path)
+        try:
+            dataSheet = self.getDataSheet(dataWb)
+
+            #Only read up to the last of the header columns and the body columns, and keep the columns that were
+            #cached for other reports so the file is not read again for them
+            maxCol = max(self.getLastColumnNum(dataSheet, sCol, hNumCols, bNumCols, addClosingCols), cachedColumns)
+
+            #Read the columns once
+            sourceSheet = SourceSheet(list(dataSheet.iter_rows(max_col = maxCol, values_only = True)),
+                                      dataSheet.max_row, dataSheet.max_column)
+
+        finally:
+
+            #Close the excel workbook, a read only workbook keeps its file open until it is closed
+            dataWb.close()
+
+            #Delete the extra xlsx file created if the original file was converted
+            if filePath != path:
+                os.remove(filePath)
+
+        if self.studyCache != None:
+            self.studyCache.saveSheet(path, sourceSheet.rows, sourceSheet.max_row, sourceSheet.max_column, maxCol)
+
+        return sourceSheet
 
     #Loops each excel file in a directory, extracts data from it and places it in the worksheet object of the class
     def loopData(self, dirPath, fileNames, dRow, dCol, sRow, sCol, hNumCols, bNumCols, numRows = False,
@@ -423,12 +659,8 @@ class ReportsTableHandler:
             #Set the original file path
             OrgFilePath = Path(dirPath, fileName)
 
-            #Convert xls to xlsx
-            filePath = self.convertToXlsx(OrgFilePath)
-
-            #Load the excel file using openpyxl library
-            dataWb = load_workbook(filePath)
-            dataSheet = dataWb.worksheets[0]
+            #Read the excel file
+            dataSheet = self.readDataSheet(OrgFilePath, sCol, hNumCols, bNumCols, addClosingCols)
 
             #check if sCol is a string passed, change it to a number
             #Only run it once on the first iteration
@@ -458,16 +690,9 @@ class ReportsTableHandler:
                 #Transfer an extra column to the right of the last column
                 self.transferColumnsPreserved(dataSheet, dRow, startLastCol, sRow, hNumCols + 1, bNumCols, numRows = numRows)
 
-            #Close the excel workbook
-            dataWb.close()
-
             #Jump to the next insertion location of the body columns
             dCol += bNumCols + 1
 
-            #Delete the extra xlsx file created if the original file was xls
-            if Path(OrgFilePath).suffix == '.xls':
-                os.remove(filePath)
-
             #If numFiles is passed then only iterate through the number of files specified in numFiles
             if fileNames.index(fileName) >= numFiles - 1:
                 break
@@ -619,10 +844,9 @@ class ReportsTableHandler:
     def getFirstEmptyRowNum(self, sheet):
 
         #Loop through the first cell in each row
-        for row in sheet.iter_rows(min_row=2, max_col=1, max_row=sheet.max_row):
-            for cell in row:
-                if cell.value == None:
-                    return cell.row
+        for row, (value,) in enumerate(sheet.iter_rows(min_row=2, max_col=1, max_row=sheet.max_row, values_only=True), 2):
+            if value == None:
+                return row
 
         return sheet.max_row
 
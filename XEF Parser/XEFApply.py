@@ -0,0 +1,339 @@
+# Author: M. Adil Zafar Khan
+# Date: 26th October 2021
+# Description: Reverse path of the XEF Parser. Takes an edited csv (a Vijeo export or a tag list) and writes the comments
+# and the CustomerString (meta tags) of the matching dataBlock variables back into the XEF/ZEF file. The file is copied
+# through byte for byte while expat finds the variables, only the variables that change are parsed and written again.
+#
+# Usage: python XEFApply.py project.zef edits.csv [--output edited.zef] [--encoding cp1252] [--summary summary.json]
+
+# Importing libraries (make sure any missing libraries are installed)
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import zipfile
+import argparse
+from pathlib import Path
+from collections import namedtuple
+from xml.parsers import expat
+import xml.etree.ElementTree as ET
+from XEFHandler import openXef
+
+#-----------------------------------------------------Functions-----------------------------------------------------
+
+# New comment and CustomerString of a variable, None leaves the value as it is and '' removes it
+Edit = namedtuple('Edit', ['comment', 'customerString'])
+
+# Returns the name of a variable in the XEF from an exported name, the project name in front of the '.' is removed
+def variableName(exportedName):
+    return exportedName.split('.', 1)[-1].strip()
+
+# Reads the edits from a csv and returns them by variable name
+# A Vijeo export gives the comments (Description column), a tag list gives the comments and, if it has a Meta Tags
+# column, the CustomerString of every variable
+# Raises ValueError if the csv has no Name column
+def readEdits(csvPath, encoding = None):
+
+    edits = {}
+
+    with open(csvPath, 'r', newline = "", encoding = encoding) as csvFile:
+        reader = csv.reader(csvFile)
+        header = next(reader, [])
+
+        # A Vijeo export starts with its version row, the column names are on the next row
+        vijeo = len(header) > 0 and header[0].lstrip('\ufeff') == "'5.1.0"
+        if vijeo:
+            header = next(reader, [])
+        header = [column.lstrip('\ufeff').strip() for column in header]
+
+        if 'Name' not in header:
+            raise ValueError("No Name column found in " + str(csvPath))
+
+        nameColumn = header.index('Name')
+        commentColumn = header.index('Description') if 'Description' in header else None
+        metaColumn = None if vijeo or 'Meta Tags' not in header else header.index('Meta Tags')
+
+        for row in reader:
+
+            # Only the variable rows of a Vijeo export are edits, the folder rows are skipped
+            if len(row) <= nameColumn or (vijeo and row[0] != 'Variable'):
+                continue
+
+            comment = None if commentColumn is None or len(row) <= commentColumn else row[commentColumn]
+            customerString = None if metaColumn is None or len(row) <= metaColumn else row[metaColumn].strip()
+            edits[variableName(row[nameColumn])] = Edit(comment, customerString)
+
+    return edits
+
+# Removes a child element and keeps the indentation of the element that follows it
+def removeChild(elem, child):
+
+    children = list(elem)
+    index = children.index(child)
+
+    # The last child holds the indentation of the end tag of the element
+    if index == len(children) - 1:
+        if index == 0:
+            elem.text = child.tail
+        else:
+            children[index - 1].tail = child.tail
+
+    elem.remove(child)
+
+# Inserts a child element at a position with the same indentation as the element that is there now
+def insertChild(elem, index, child):
+
+    children = list(elem)
+    if index < len(children):
+        child.tail = elem.text if index == 0 else children[index - 1].tail
+    elif len(children) > 0:
+        child.tail = children[-1].tail
+        children[-1].tail = elem.text
+
+    elem.insert(index, child)
+
+# Applies an edit to a variable element, returns True if the variable changed
+def applyEdit(variable, edit):
+
+    changed = False
+
+    # Find the comment and the CustomerString, the same elements readVariable uses
+    comment = None
+    customerString = None
+    for child in variable:
+        if child.tag == 'comment' and comment is None:
+            comment = child
+        elif child.tag == 'attribute' and child.get('name') == 'CustomerString' and customerString is None:
+            customerString = child
+
+    if edit.comment is not None and edit.comment != ('' if comment is None else comment.text or ''):
+        changed = True
+        if edit.comment == '':
+            removeChild(variable, comment)
+            comment = None
+        elif comment is not None:
+            comment.text = edit.comment
+        else:
+            # The comment comes before the attributes
+            comment = ET.Element('comment')
+            comment.text = edit.comment
+            insertChild(variable, 0, comment)
+
+    if edit.customerString is not None and edit.customerString != ('' if customerString is None else customerString.get('value', '')):
+        changed = True
+        if edit.customerString == '':
+            removeChild(variable, customerString)
+        elif customerString is not None:
+            customerString.set('value', edit.customerString)
+        else:
+            # Add the CustomerString after the last attribute, or after the comment if there are no attributes
+            position = 0
+            for index, child in enumerate(variable):
+                if child.tag == 'attribute' or child is comment:
+                    position = index + 1
+            insertChild(variable, position, ET.Element('attribute', {'name': 'CustomerString', 'value': edit.customerString}))
+
+    return changed
+
+# Copies an XEF stream to an output and rewrites the dataBlock variables that have an edit
+# Only the bytes of a changed variable are replaced, everything else is written out exactly as it was read
+class XefRewriter:
+
+    # Initialize class
+    def __init__(self, edits, output, chunkSize = 1048576):
+
+        self.edits = edits
+        self.output = output
+        self.chunkSize = chunkSize
+
+        # Bytes read but not written yet, base is the offset of the first of them in the file
+        self.pending = bytearray()
+        self.base = 0
+
+        # Offset up to which the file has been written
+        self.written = 0
+
+        # Offset up to which every element has been read by expat, nothing before it can still be rewritten
+        self.safe = 0
+
+        # Tags of the elements that are open, the start offset and name of the dataBlock variable that is open
+        self.stack = []
+        self.variableStart = None
+        self.variableName = None
+
+        self.matched = 0
+        self.changed = 0
+        self.found = set()
+
+        self.parser = expat.ParserCreate()
+        self.parser.StartElementHandler = self.startElement
+        self.parser.EndElementHandler = self.endElement
+
+    # Called by expat at the start of every element
+    def startElement(self, tag, attributes):
+
+        position = self.parser.CurrentByteIndex
+        self.safe = position
+
+        # Remember where the variables of a top level dataBlock start
+        if len(self.stack) == 2 and tag == 'variables' and self.stack[1] == 'dataBlock':
+            self.variableStart = position
+            self.variableName = attributes.get('name')
+
+        self.stack.append(tag)
+
+    # Called by expat at the end of every element
+    def endElement(self, tag):
+
+        self.stack.pop()
+        position = self.parser.CurrentByteIndex
+        self.safe = position
+
+        if len(self.stack) != 2 or self.variableStart is None:
+            return
+
+        start = self.variableStart
+        name = self.variableName
+        self.variableStart = None
+
+        edit = self.edits.get(name)
+        if edit is None:
+            return
+
+        self.matched += 1
+        self.found.add(name)
+
+        # The end tag starts at the position, an empty element (<variables ... />) ends at the position
+        offset = position - self.base
+        if self.pending.startswith(b'</', offset):
+            end = self.pending.index(b'>', offset) + 1 + self.base
+        else:
+            end = position
+        self.safe = end
+
+        # Parse the variable on its own and write it back only if the edit changes it
+        variable = ET.fromstring(bytes(self.pending[start - self.base:end - self.base]))
+        if not applyEdit(variable, edit):
+            return
+
+        self.changed += 1
+        self.output.write(self.pending[self.written - self.base:start - self.base])
+        self.output.write(ET.tostring(variable, encoding = 'unicode', short_empty_elements = False).encode('utf-8'))
+        self.written = end
+
+    # Writes the bytes that can no longer change and drops them from the pending bytes
+    def flush(self, final = False):
+
+        # A variable that is still open may be rewritten, so only write up to its start
+        upTo = len(self.pending) + self.base if final else (self.safe if self.variableStart is None else self.variableStart)
+
+        if upTo > self.written:
+            self.output.write(self.pending[self.written - self.base:upTo - self.base])
+            self.written = upTo
+
+        del self.pending[:self.written - self.base]
+        self.base = self.written
+
+    # Copies the whole source stream to the output
+    # Returns the number of variables with an edit, the number that changed and the names of the variables found
+    # Raises ET.ParseError if the XEF is not valid XML
+    def rewrite(self, source):
+
+        try:
+            while True:
+                chunk = source.read(self.chunkSize)
+                self.pending += chunk
+                self.parser.Parse(chunk, len(chunk) == 0)
+
+                if len(chunk) == 0:
+                    break
+                self.flush()
+
+        except expat.ExpatError as e:
+            raise ET.ParseError(str(e)) from e
+
+        self.flush(final = True)
+        return self.matched, self.changed, self.found
+
+# Applies the edits of a csv to an XEF or ZEF file and saves the result to outPath
+# The result is written to a temporary file first so the input is never left half written, outPath can be the input
+# A ZEF file keeps all its other files, only its XEF is rewritten
+# Returns the summary of the edits
+# Raises ET.ParseError, OSError, zipfile.BadZipFile or ValueError if a file cannot be read
+def applyEdits(filePath, csvPath, outPath = None, encoding = None):
+
+    # Start the timer
+    startTime = time.perf_counter()
+
+    edits = readEdits(csvPath, encoding)
+
+    # Save next to the input file by default
+    if outPath is None:
+        path = Path(filePath)
+        outPath = str(path.with_name(path.stem + '_Edited' + path.suffix))
+
+    tempPath = outPath + '.tmp'
+    try:
+        if Path(filePath).suffix == '.zef':
+
+            # Find the XEF in the ZEF the same way the parser does
+            xefFile, xefName = openXef(filePath)
+            xefFile.close()
+
+            with zipfile.ZipFile(filePath, 'r') as zef, zipfile.ZipFile(tempPath, 'w') as outZef:
+                for info in zef.infolist():
+                    with zef.open(info) as source, outZef.open(info, 'w', force_zip64 = info.file_size > zipfile.ZIP64_LIMIT // 2) as output:
+                        if info.filename == xefName:
+                            matched, changed, found = XefRewriter(edits, output).rewrite(source)
+                        else:
+                            shutil.copyfileobj(source, output, 1048576)
+        else:
+            with open(filePath, 'rb') as source, open(tempPath, 'wb', buffering = 1048576) as output:
+                matched, changed, found = XefRewriter(edits, output).rewrite(source)
+
+        os.replace(tempPath, outPath)
+
+    except:
+        # Do not leave the temporary file behind
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+
+    return {'input': str(filePath), 'edits': str(csvPath), 'output': outPath, 'rows': len(edits), 'matched': matched,
+            'changed': changed, 'unchanged': matched - changed,
+            'notFound': [name for name in edits if name not in found],
+            'seconds': round(time.perf_counter() - startTime, 3)}
+
+#-----------------------------------------------------Main-----------------------------------------------------
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Write the comments and meta tags of an edited csv back into an XEF/ZEF file.")
+    parser.add_argument('input', help = "XEF/ZEF file")
+    parser.add_argument('edits', help = "Edited Vijeo export or tag list csv")
+    parser.add_argument('--output', default = None, help = "Path of the edited file (default: <input>_Edited next to the input)")
+    parser.add_argument('--encoding', default = None, help = "Encoding of the csv (default: the system encoding, same as the export)")
+    parser.add_argument('--summary', default = '-', help = "Path of the JSON summary (default: standard output)")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = applyEdits(args.input, args.edits, args.output, args.encoding)
+    except (ET.ParseError, OSError, zipfile.BadZipFile, ValueError, UnicodeDecodeError) as e:
+        print("Error: " + str(e), file = sys.stderr)
+        return 1
+
+    # Write the summary as JSON
+    if args.summary == '-':
+        json.dump(summary, sys.stdout, indent = 2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.summary, 'w') as summaryFile:
+            json.dump(summary, summaryFile, indent = 2)
+
+    return 0
+
+if __name__ == '__main__':
+
+    sys.exit(main())
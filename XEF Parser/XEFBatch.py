@@ -0,0 +1,213 @@
+# Author: M. Adil Zafar Khan
+# Date: 26th October 2021
+# Description: Headless batch version of the XEF Parser. Converts a directory or glob of XEF/ZEF files in parallel,
+# writes one Vijeo CSV (and any other output format) per project and prints a JSON summary of the warnings and timings.
+#
+# Usage: python XEFBatch.py "C:\Projects\*.zef" --alarm-group ALARMS --scan-group SCAN [--log-group LOGS]
+#                           [--output-dir DIR] [--workers N] [--incremental] [--scan-plan report|assign]
+#                           [--max-request WORDS] [--max-gap WORDS] [--backend lxml|stdlib] [--stats]
+#                           [--catalog catalog.db] [--cache-dir DIR] [--cache-size MB] [--format vijeo|jsonl|taglist ...]
+#                           [--no-expand] [--check-addresses] [--summary summary.json]
+
+# Importing libraries (make sure any missing libraries are installed)
+import os
+import sys
+import glob
+import json
+import time
+import zipfile
+import argparse
+from pathlib import Path
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from XEFHandler import exportXEF, getBackend, writers
+from XEFCatalog import TagCatalog
+from XEFCache import ParseCache
+
+#-----------------------------------------------------Functions-----------------------------------------------------
+
+# Collects all the XEF and ZEF files from a list of files, directories and glob patterns
+def collectFiles(patterns):
+
+    files = []
+    for pattern in patterns:
+
+        # Take every file inside a directory, otherwise expand the glob pattern
+        if os.path.isdir(pattern):
+            candidates = sorted(os.path.join(pattern, name) for name in os.listdir(pattern))
+        else:
+            candidates = sorted(glob.glob(pattern))
+
+        # Only keep the XEF and ZEF files and skip files that were already added
+        for candidate in candidates:
+            if Path(candidate).suffix in ('.xef', '.zef') and candidate not in files:
+                files.append(candidate)
+
+    return files
+
+# Returns the groups of files that would be saved under the same output file names or catalog project name
+# The outputs are named after the file name without its extension, so P.xef and P.zef, or projects with the same name
+# from different directories saved to one output directory, would overwrite each other
+def findDuplicateNames(files, outDir = None, catalog = False):
+
+    groups = {}
+    for filePath in files:
+
+        # The catalog keeps a single project of every name whatever directory it came from
+        dirPath = '' if outDir is not None or catalog else os.path.dirname(os.path.abspath(filePath))
+        key = (os.path.normcase(dirPath), os.path.normcase(Path(filePath).stem))
+        groups.setdefault(key, []).append(filePath)
+
+    return [group for group in groups.values() if len(group) > 1]
+
+# Converts a single XEF or ZEF file, runs inside a worker process
+# Returns the export summary with the list of warnings, or the error if the file could not be converted
+# Any error is kept as the error of the file so one bad project never stops the rest of the batch
+def convertFile(filePath, alarmGroup, scanGroup, logStatus, groupLog, outDir, incremental, scanPlan, maxRequest, maxGap,
+                backend, saveStats, catalogPath, cacheDir, cacheSize, formats, expandStructures, checkAddresses):
+
+    # List of all the warnings given during the export
+    messages = []
+
+    # Stores a warning in the messages list
+    def warn(message, critical = False):
+        messages.append({'message': message, 'critical': critical})
+
+    catalog = None
+
+    # Name the csv after the input file so every project gets its own csv
+    try:
+        # Every worker opens its own connection to the tag catalog
+        catalog = None if catalogPath is None else TagCatalog(catalogPath)
+        cache = None if cacheDir is None else ParseCache(cacheDir, cacheSize)
+
+        summary = exportXEF(filePath, alarmGroup, scanGroup, logStatus, groupLog, Path(filePath).stem, warn, outDir,
+                            incremental, scanPlan, maxRequest, maxGap, backend, saveStats, catalog = catalog,
+                            cache = cache, formats = formats, expandStructures = expandStructures,
+                            checkAddresses = checkAddresses)
+    except (ET.ParseError, OSError, zipfile.BadZipFile) as e:
+        summary = {'input': str(filePath), 'error': str(e)}
+    except Exception as e:
+        summary = {'input': str(filePath), 'error': type(e).__name__ + ": " + str(e)}
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+    summary['messages'] = messages
+    return summary
+
+# Converts all the given files on a process pool and returns the summary of the batch
+# Raises ValueError if two files would be saved under the same name, before any file is converted
+def convertFiles(files, alarmGroup, scanGroup, logStatus, groupLog, outDir = None, workers = None, incremental = False,
+                 scanPlan = None, maxRequest = 125, maxGap = 8, backend = None, saveStats = False, catalogPath = None,
+                 cacheDir = None, cacheSize = 512 * 1024 * 1024, formats = None, expandStructures = True,
+                 checkAddresses = False):
+
+    # Check that no file overwrites the outputs of another one
+    duplicates = findDuplicateNames(files, outDir, catalogPath is not None)
+    if len(duplicates) > 0:
+        raise ValueError("files with the same name would overwrite each other's output, rename them or convert them "
+                         "separately: " + "; ".join(", ".join(group) for group in duplicates))
+
+    # Start the batch timer
+    startTime = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = [executor.submit(convertFile, filePath, alarmGroup, scanGroup, logStatus, groupLog, outDir, incremental,
+                                   scanPlan, maxRequest, maxGap, backend, saveStats, catalogPath, cacheDir, cacheSize,
+                                   formats, expandStructures, checkAddresses)
+                   for filePath in files]
+
+        # Keep the results in the same order as the input files
+        projects = []
+        for filePath, future in zip(files, futures):
+
+            # A worker that crashed only fails its own file
+            try:
+                projects.append(future.result())
+            except Exception as e:
+                projects.append({'input': str(filePath), 'error': type(e).__name__ + ": " + str(e), 'messages': []})
+
+    return {'files': len(files), 'failed': sum(1 for project in projects if 'error' in project),
+            'seconds': round(time.perf_counter() - startTime, 3), 'projects': projects}
+
+#-----------------------------------------------------Main-----------------------------------------------------
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Convert XEF/ZEF files into Vijeo Designer CSV files.")
+    parser.add_argument('inputs', nargs = '+', help = "XEF/ZEF files, directories or glob patterns")
+    parser.add_argument('--alarm-group', required = True, help = "Alarm Group name")
+    parser.add_argument('--scan-group', required = True, help = "Scan Group name")
+    parser.add_argument('--log-group', default = '', help = "Logging Group name, enables the Logging Group when given")
+    parser.add_argument('--output-dir', default = None, help = "Directory for the csv files (default: next to each input file)")
+    parser.add_argument('--workers', type = int, default = None, help = "Number of worker processes (default: number of CPUs)")
+    parser.add_argument('--incremental', action = 'store_true',
+                        help = "Also write a delta csv with the variables added or changed since the last incremental export")
+    parser.add_argument('--scan-plan', choices = ['report', 'assign'], default = None,
+                        help = "Pack the variables into blocks of neighbouring addresses and save the plan ('report') "
+                               "or also give every variable the scan group of its block ('assign')")
+    parser.add_argument('--max-request', type = int, default = 125, help = "Largest scan block in words (default: 125)")
+    parser.add_argument('--max-gap', type = int, default = 8, help = "Largest number of unused words inside a scan block (default: 8)")
+    parser.add_argument('--backend', choices = ['lxml', 'stdlib'], default = None,
+                        help = "XML parser backend (default: lxml when it is installed, otherwise stdlib)")
+    parser.add_argument('--stats', action = 'store_true',
+                        help = "Also save the time and item count of every export stage to a JSON file next to each csv")
+    parser.add_argument('--catalog', default = None,
+                        help = "Also load the exported variables of every project into this SQLite tag catalog")
+    parser.add_argument('--cache-dir', default = None,
+                        help = "Cache the parsed variables in this directory so unchanged files are not parsed again")
+    parser.add_argument('--cache-size', type = int, default = 512, help = "Largest size of the cache in MB (default: 512)")
+    parser.add_argument('--format', dest = 'formats', action = 'append', choices = sorted(writers), default = None,
+                        help = "Output format, repeat to write several formats from a single parse (default: vijeo)")
+    parser.add_argument('--no-expand', dest = 'expand', action = 'store_false',
+                        help = "Do not expand the structured (DDT and array) HMI variables into their elementary fields")
+    parser.add_argument('--check-addresses', action = 'store_true',
+                        help = "Warn about variables that share their memory with another variable")
+    parser.add_argument('--summary', default = '-', help = "Path of the JSON summary (default: standard output)")
+    args = parser.parse_args(argv)
+
+    # Check the backend before any worker is started
+    try:
+        getBackend(args.backend)
+    except ValueError as e:
+        parser.error(str(e))
+
+    files = collectFiles(args.inputs)
+    if len(files) == 0:
+        parser.error("no .xef or .zef files found")
+
+    # Create the output directory if it does not exist yet
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok = True)
+
+    # Create the tables of the tag catalog once before the workers use it
+    if args.catalog is not None:
+        TagCatalog(args.catalog).close()
+
+    # The Logging Group is enabled with 1 and disabled with 2, same as the radio buttons of the GUI
+    logStatus = 1 if len(args.log_group) > 0 else 2
+
+    # Files with the same name are rejected before any output is written
+    try:
+        summary = convertFiles(files, args.alarm_group, args.scan_group, logStatus, args.log_group,
+                               args.output_dir, args.workers, args.incremental, args.scan_plan, args.max_request,
+                               args.max_gap, args.backend, args.stats, args.catalog, args.cache_dir,
+                               args.cache_size * 1024 * 1024, args.formats, args.expand, args.check_addresses)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Write the summary as JSON
+    if args.summary == '-':
+        json.dump(summary, sys.stdout, indent = 2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.summary, 'w') as summaryFile:
+            json.dump(summary, summaryFile, indent = 2)
+
+    # Return a failure exit code if any project could not be converted
+    return 1 if summary['failed'] > 0 else 0
+
+if __name__ == '__main__':
+
+    sys.exit(main())
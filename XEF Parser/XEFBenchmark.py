@@ -0,0 +1,591 @@
+# Author: M. Adil Zafar Khan
+# Date: 26th October 2021
+# Description: Synthetic XEF/ZEF generator and benchmark suite of the XEF Parser. Builds realistic project files of
+# several sizes, times every stage of the export (unzip, parse, variable walk and csv write), measures the peak memory
+# and saves the results to JSON so they can be compared between releases.
+# peakMemory is the memory allocated by Python (tracemalloc), memory used inside the lxml C parser is only part of peakRSS.
+# The memory command parses every size in its own process with every backend and fails if the peak RSS grows with the
+# size of the file.
+# The metatags command checks the meta tag matching rules and times parseMetaTags against the parser it replaced.
+# The rows command measures the memory of the exported rows held as VijeoRow records and as full 46 column lists.
+#
+# Usage: python XEFBenchmark.py run [--sizes 10000 100000 1000000] [--format zef|xef] [--backend lxml|stdlib]
+#                                   [--repeat N] [--work-dir DIR] [--output results.json]
+#        python XEFBenchmark.py memory [--sizes 10000 100000 1000000] [--format zef|xef] [--backend lxml|stdlib]
+#                                      [--tolerance 8] [--work-dir DIR]
+#        python XEFBenchmark.py metatags [--count 1000000] [--distinct 2000] [--seed 0]
+#        python XEFBenchmark.py rows [--hmi 100000] [--format zef|xef] [--backend lxml|stdlib]
+#        python XEFBenchmark.py generate project.zef --hmi 10000 [--other 2500] [--seed 0]
+
+# Importing libraries (make sure any missing libraries are installed)
+import io
+import os
+import sys
+import json
+import time
+import random
+import zipfile
+import platform
+import argparse
+import subprocess
+import tempfile
+import tracemalloc
+from pathlib import Path
+from xml.sax.saxutils import quoteattr, escape
+from XEFHandler import openXef, getBackend, backends, savetoCSV, exportXEF, XefParser, parseMetaTags, noMetaTags
+
+#-----------------------------------------------------Functions-----------------------------------------------------
+
+# Meta tags given to the generated HMI variables and how often each one is used
+metaTagMix = [('-a', 20), ('-t', 8), ('-e', 6), ('-s', 14), ('-s -table=HPU', 6), ('-a -log -logper=1', 4),
+              ('-log -logper=60 -logdb=DB1', 6), ('-s -eu=psi -mineu=0 -maxeu=100 -f=###.#', 8),
+              ('-i -onmsg=Open -offmsg=Closed', 4), ('-nc', 2), (None, 22)]
+
+# Data types of the generated variables with the memory area they are mapped to and the number of words they use
+dataTypes = [('EBOOL', 'M', 1), ('BOOL', 'MW.X', 1), ('INT', 'MW', 1), ('UINT', 'MW', 1), ('DINT', 'MD', 2),
+             ('UDINT', 'MD', 2), ('REAL', 'MF', 2)]
+
+# Addresses of the generated variables that are not in the %M memory and cannot be exported
+foreignAddresses = ['%I0.3.{0}', '%Q0.4.{0}', '%SW{0}', '%IW0.2.{0}', None]
+
+# Writes the sections that come before the dataBlock in a real project (function block and DDT sources)
+def writeSources(xef, count):
+
+    for i in range(count):
+        xef.write('\t<FBSource nameOfFBType="FB_' + str(i) + '" version="0.1">\n\t\t<inputParameters>\n')
+        for j in range(8):
+            xef.write('\t\t\t<variables name="IN_' + str(j) + '" typeName="INT">\n'
+                      '\t\t\t\t<attribute name="PositionPin" value="' + str(j + 1) + '"></attribute>\n\t\t\t</variables>\n')
+        xef.write('\t\t</inputParameters>\n\t\t<outputParameters>\n'
+                  '\t\t\t<variables name="OUT" typeName="BOOL">\n'
+                  '\t\t\t\t<attribute name="PositionPin" value="1"></attribute>\n\t\t\t</variables>\n'
+                  '\t\t</outputParameters>\n\t\t<privateLocalVariables>\n'
+                  '\t\t\t<variables name="STATE" typeName="INT"></variables>\n\t\t</privateLocalVariables>\n'
+                  '\t\t<FBProgram name="FB_' + str(i) + '">\n\t\t\t<STSource>OUT := IN_0 &gt; IN_1;</STSource>\n'
+                  '\t\t</FBProgram>\n\t</FBSource>\n')
+        xef.write('\t<DDTSource DDTName="T_' + str(i) + '" version="0.1">\n\t\t<structure>\n'
+                  '\t\t\t<variables name="RUNNING" typeName="BOOL">\n\t\t\t\t<comment>Running</comment>\n'
+                  '\t\t\t\t<attribute name="CustomerString" value="-a"></attribute>\n\t\t\t</variables>\n'
+                  '\t\t\t<variables name="VALUE" typeName="REAL"></variables>\n'
+                  '\t\t\t<variables name="STATUS" typeName="WORD"></variables>\n\t\t</structure>\n\t</DDTSource>\n')
+
+# Writes the program sections that come after the dataBlock in a real project
+# Every other section is a ladder section, which is made of many small elements instead of a single block of text
+def writePrograms(xef, count):
+
+    for i in range(count):
+        xef.write('\t<program>\n\t\t<identProgram name="SECTION_' + str(i) + '" type="section" task="MAST"></identProgram>\n')
+
+        if i % 2 == 0:
+            xef.write('\t\t<STSource>')
+            xef.write(escape('IF HMI_START_' + str(i) + ' AND NOT TRIP_' + str(i) + ' THEN\n    RUN_' + str(i) + ' := TRUE;\nEND_IF;\n') * 20)
+            xef.write('</STSource>\n')
+        else:
+            xef.write('\t\t<LDSource nbColumns="11">\n')
+            for j in range(50):
+                xef.write('\t\t\t<networkLD>\n\t\t\t\t<typeLine type="contact"><objPosition posX="0" posY="' + str(j) + '"></objPosition>'
+                          '<contactVariableName>HMI_START_' + str(i) + '_' + str(j) + '</contactVariableName></typeLine>\n'
+                          '\t\t\t\t<FFBBlock instanceName="TON_' + str(i) + '_' + str(j) + '" typeName="TON">'
+                          '<objPosition posX="4" posY="' + str(j) + '"></objPosition>'
+                          '<inputVariable formalParameter="PT" effectiveParameter="T#5S"></inputVariable></FFBBlock>\n'
+                          '\t\t\t</networkLD>\n')
+            xef.write('\t\t</LDSource>\n')
+
+        xef.write('\t</program>\n')
+
+# Writes a synthetic XEF project to a text file object
+# hmiCount variables have the HMI attribute and otherCount variables do not, foreignRatio of the HMI variables get an
+# address outside the %M memory, structRatio of the HMI variables are DDT instances located in %MW memory and
+# commentRatio of all the variables get a comment
+def writeXEF(xef, hmiCount, otherCount, seed = 0, commentRatio = 0.7, foreignRatio = 0.05, structRatio = 0.0):
+
+    r = random.Random(seed)
+    metaTags = [tag for tag, weight in metaTagMix]
+    metaWeights = [weight for tag, weight in metaTagMix]
+
+    xef.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<ZEFExchangeFile>\n'
+              '\t<fileHeader company="Schneider Automation" product="Control Expert V14.1" content="Project source file" DTDVersion="41"></fileHeader>\n'
+              '\t<contentHeader name="BENCHMARK_PROJ" version="0.0.1"></contentHeader>\n')
+    sourceCount = max(1, (hmiCount + otherCount) // 5000)
+    writeSources(xef, sourceCount)
+
+    # Next free word of every memory area, variables are packed with small gaps like a real memory map
+    nextWord = {'M': 0, 'MW': 0, 'MD': 20000, 'MF': 40000}
+    bit = 16
+
+    xef.write('\t<dataBlock>\n')
+    total = hmiCount + otherCount
+    hmiLeft = hmiCount
+    for i in range(total):
+
+        # Spread the HMI variables evenly through the dataBlock
+        isHMI = r.random() * (total - i) < hmiLeft
+        if isHMI:
+            hmiLeft -= 1
+
+        dataType, area, size = r.choice(dataTypes)
+
+        # Make some HMI variables instances of a DDT (BOOL, REAL and WORD fields in 4 words)
+        if isHMI and structRatio > 0 and r.random() < structRatio:
+            dataType = 'T_' + str(r.randrange(sourceCount))
+            address = '%MW' + str(nextWord['MW'])
+            nextWord['MW'] += 4
+
+        # Give the variable an address
+        elif isHMI and r.random() < foreignRatio:
+            address = r.choice(foreignAddresses)
+            if address is not None:
+                address = address.format(i % 16)
+        elif area == 'MW.X':
+            if bit == 16:
+                bit = 0
+                word = nextWord['MW']
+                nextWord['MW'] += 1
+            address = '%MW' + str(word) + '.' + str(bit)
+            bit += 1
+        else:
+            address = '%' + area + str(nextWord[area])
+            nextWord[area] += size + (r.randrange(4) if r.random() < 0.1 else 0)
+
+        xef.write('\t\t<variables name="VAR_' + str(i) + '" typeName="' + dataType + '"')
+        if address is not None:
+            xef.write(' topologicalAddress="' + address + '"')
+        xef.write('>\n')
+
+        if r.random() < commentRatio:
+            xef.write('\t\t\t<comment>' + escape('Pump ' + str(i % 97) + ' status & alarm <' + str(i) + '>') + '</comment>\n')
+
+        if isHMI:
+            xef.write('\t\t\t<attribute name="IsVariableHMI" value="-1"></attribute>\n')
+            metaTag = r.choices(metaTags, metaWeights)[0]
+            if metaTag is not None:
+                xef.write('\t\t\t<attribute name="CustomerString" value=' + quoteattr(metaTag) + '></attribute>\n')
+        else:
+            xef.write('\t\t\t<attribute name="Save" value="-1"></attribute>\n')
+
+        xef.write('\t\t</variables>\n')
+
+    xef.write('\t</dataBlock>\n')
+    writePrograms(xef, max(1, total // 1000))
+    xef.write('</ZEFExchangeFile>\n')
+
+# Generates a synthetic XEF file, or a ZEF file when the path has a .zef extension
+# The XEF of a ZEF file is compressed while it is written so it is never held in memory
+# Returns the size of the file in bytes
+def generateProject(path, hmiCount, otherCount = None, seed = 0, commentRatio = 0.7, foreignRatio = 0.05, structRatio = 0.0):
+
+    # By default a quarter as many variables are not shared with the HMI
+    if otherCount is None:
+        otherCount = hmiCount // 4
+
+    if Path(path).suffix == '.zef':
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zef:
+            zef.writestr('props.xml', '<props></props>')
+            with io.TextIOWrapper(zef.open('unitpro.xef', 'w'), encoding='utf-8', newline='\n') as xef:
+                writeXEF(xef, hmiCount, otherCount, seed, commentRatio, foreignRatio, structRatio)
+    else:
+        with open(path, 'w', encoding='utf-8', newline='\n', buffering=1048576) as xef:
+            writeXEF(xef, hmiCount, otherCount, seed, commentRatio, foreignRatio, structRatio)
+
+    return os.path.getsize(path)
+
+# Runs func and returns its result, its wall time in seconds and its peak Python memory in bytes
+# The time is the best of repeat untraced runs, the memory is measured on one more run with tracemalloc
+def measure(func, repeat = 1):
+
+    seconds = None
+    for i in range(repeat):
+        startTime = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - startTime
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    tracemalloc.start()
+    try:
+        func()
+        peakMemory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return result, seconds, peakMemory
+
+# Unzip stage, reads the XEF out of the file without parsing it and returns the number of bytes read
+def readProject(path):
+
+    xefFile, xefName = openXef(path)
+    size = 0
+    with xefFile:
+        for chunk in iter(lambda: xefFile.read(1048576), b''):
+            size += len(chunk)
+
+    return size
+
+# Parse stage, streams the HMI variables of the file and returns how many were found
+def parseProject(path, backend):
+
+    xefFile, xefName = openXef(path)
+    with xefFile:
+        return sum(1 for variable in getBackend(backend).iterVariables(xefFile, {}))
+
+# Creates the parser used by the variable walk, set up like the export of the GUI with the Logging Group enabled
+def createParser(path, backend):
+
+    return XefParser(path, 'ALARMS', 'SCAN', 1, 'LOGS', lambda message, critical = False: None, backend = backend)
+
+# Variable walk stage, builds the Vijeo row of every HMI variable and returns how many were exported
+def walkProject(path, backend):
+
+    return sum(1 for row in createParser(path, backend).rows())
+
+# Benchmarks the export of a single project file and returns the results of every stage
+# The parse and walk passes also read and parse the file, so their stage times are the difference with the previous pass
+def benchmarkProject(path, backend = None, repeat = 1, workDir = None):
+
+    workDir = os.path.dirname(path) if workDir is None else workDir
+    csvPath = os.path.join(workDir, Path(path).stem + "_Vijeo_Export.csv")
+
+    size, readSeconds, readMemory = measure(lambda: readProject(path), repeat)
+    variables, parseSeconds, parseMemory = measure(lambda: parseProject(path, backend), repeat)
+    exported, walkSeconds, walkMemory = measure(lambda: walkProject(path, backend), repeat)
+
+    # The csv write is timed on its own from rows that are already in memory
+    rows = list(createParser(path, backend).rows())
+    written, writeSeconds, writeMemory = measure(lambda: savetoCSV('BENCHMARK', rows, csvPath), repeat)
+    del rows
+
+    # Time and memory of the whole export as the GUI runs it
+    summary, exportSeconds, exportMemory = measure(lambda: exportXEF(path, 'ALARMS', 'SCAN', 1, 'LOGS', Path(path).stem,
+                                                                     lambda message, critical = False: None,
+                                                                     workDir, backend = backend), repeat)
+    os.remove(csvPath)
+
+    return {'file': os.path.basename(path), 'fileBytes': os.path.getsize(path), 'xefBytes': size,
+            'backend': summary['backend'], 'hmiVariables': variables, 'exported': exported,
+            'stages': {'unzip': {'seconds': round(readSeconds, 4), 'peakMemory': readMemory},
+                       'parse': {'seconds': round(max(parseSeconds - readSeconds, 0), 4), 'peakMemory': parseMemory},
+                       'walk': {'seconds': round(max(walkSeconds - parseSeconds, 0), 4), 'peakMemory': walkMemory},
+                       'write': {'seconds': round(writeSeconds, 4), 'peakMemory': writeMemory}},
+            'wallSeconds': round(exportSeconds, 4), 'peakMemory': exportMemory,
+            'variablesPerSecond': round(variables / exportSeconds) if exportSeconds > 0 else None}
+
+# Returns the peak resident memory of the process in bytes, None on Windows where the resource module does not exist
+def peakRSS():
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+# Generates a project for every size and benchmarks it
+# Returns the results together with the details of the machine so runs of different releases can be compared
+def runBenchmark(sizes, fileFormat = 'zef', backend = None, repeat = 1, workDir = None, seed = 0):
+
+    results = []
+    with tempfile.TemporaryDirectory() as tempDir:
+
+        workDir = tempDir if workDir is None else workDir
+
+        for size in sizes:
+            path = os.path.join(workDir, "benchmark_" + str(size) + "." + fileFormat)
+
+            startTime = time.perf_counter()
+            generateProject(path, size, seed = seed)
+            generateSeconds = time.perf_counter() - startTime
+
+            result = benchmarkProject(path, backend, repeat, workDir)
+            result['size'] = size
+            result['generateSeconds'] = round(generateSeconds, 4)
+            results.append(result)
+
+            os.remove(path)
+
+    return {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'backend': getBackend(backend).name, 'format': fileFormat,
+            'repeat': repeat, 'results': results, 'peakRSS': peakRSS()}
+
+# Parses a project in a new process and returns the number of HMI variables found and the peak RSS of that process
+# Every file gets its own process since the peak RSS of a process never goes down
+def measureParseRSS(path, backend = None):
+
+    command = [sys.executable, os.path.abspath(__file__), 'parse', path]
+    if backend is not None:
+        command += ['--backend', backend]
+
+    result = json.loads(subprocess.run(command, stdout = subprocess.PIPE, check = True).stdout)
+    return result['hmiVariables'], result['peakRSS']
+
+# Generates a project for every size and measures the peak RSS of streaming its HMI variables with every backend
+# The parser keeps no variable in memory so the peak RSS must stay the same, within tolerance bytes, from the smallest
+# to the largest file
+# Returns a result per size and backend and True if the memory stayed flat with every backend, None if the peak RSS
+# cannot be measured on this platform
+def runMemoryCheck(sizes, fileFormat = 'zef', backendNames = None, tolerance = 8 * 1048576, workDir = None, seed = 0):
+
+    backendNames = sorted(backends) if backendNames is None else backendNames
+    results = []
+    with tempfile.TemporaryDirectory() as tempDir:
+
+        workDir = tempDir if workDir is None else workDir
+
+        for size in sorted(sizes):
+            path = os.path.join(workDir, "memory_" + str(size) + "." + fileFormat)
+            fileBytes = generateProject(path, size, seed = seed)
+
+            for backend in backendNames:
+                variables, rss = measureParseRSS(path, backend)
+                results.append({'backend': backend, 'size': size, 'fileBytes': fileBytes, 'hmiVariables': variables,
+                                'peakRSS': rss})
+
+            os.remove(path)
+
+    if any(result['peakRSS'] is None for result in results):
+        return results, None
+
+    # Compare the largest file with the smallest file of every backend
+    for backend in backendNames:
+        peaks = [result['peakRSS'] for result in results if result['backend'] == backend]
+        if peaks[-1] - peaks[0] > tolerance:
+            return results, False
+
+    return results, True
+
+# Returns the memory in bytes held by the exported rows of a project, once kept as VijeoRow records and once converted
+# to the 46 column lists the rows were before VijeoRow, together with the number of rows
+# Only the memory allocated while the rows are built is traced, so the parser itself is not counted once it is done
+def measureRowMemory(path, backend = None):
+
+    results = {}
+    for name, convert in (('vijeoRow', lambda row: row), ('list', lambda row: row.toList())):
+
+        # The meta tags cache is emptied so both runs hold the same MetaTags records
+        parseMetaTags.cache_clear()
+        tracemalloc.start()
+        try:
+            rows = [convert(row) for row in createParser(path, backend).rows()]
+            results[name] = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        results['rows'] = len(rows)
+        del rows
+
+    return results
+
+# Meta tags of the CustomerStrings used by the meta tag benchmark
+metaTagParts = ['-a', '-t', '-e', '-i', '-log', '-nc', '-s', '-eu=bar', '-mineu=0', '-maxeu=100', '-logper=60', '-logdb=DB1',
+                '-f=#.#', '-src=MAVEL', '-table=HPU', '-plan', '-area=N1']
+
+# CustomerStrings and the meta tags they must give, every field that is not listed must be empty
+# Tags are whole words separated by any white space, are case sensitive and the first value of a tag is kept
+metaTagRules = [('-a', {'alarm': True}), ('-t', {'trip': True}), ('-e', {'event': True}), ('-i', {'info': True}),
+                ('-s', {'status': True}), ('-nc', {'noComm': True}), ('-log', {'log': True}),
+                ('-a -t -e', {'alarm': True, 'trip': True, 'event': True}),
+                ('  -i\t-onmsg=Open  ', {'info': True, 'onMsg': 'Open'}),
+                ('x-a -ab a-t', {}), ('-A -LOG', {}), ('-nca -sx -a=1', {}),
+                ('-area=N1', {'area': 'N1'}), ('-logper=60 -logdb=DB1', {'logPer': '60', 'logDb': 'DB1'}),
+                ('-logdb=DB1 -log', {'log': True, 'logDb': 'DB1'}), ('-eu=psi -eu=bar', {'eu': 'psi'}),
+                ('-mineu= -maxeu=100', {'maxEu': '100'}), ('-f=###.# -offmsg=a=b', {'format': '###.#', 'offMsg': 'a=b'}),
+                ('-minraw=0 -maxraw=27648', {'minRaw': '0', 'maxRaw': '27648'}), ('', {})]
+
+# Finds a tag in a CustomerString as the meta tags were parsed before the single pass parser
+def referenceExtractWord(s, subStr):
+
+    findDelimiter = s.find(' ', s.find(subStr))
+    if findDelimiter != -1:
+        return s[s.find(subStr) : findDelimiter]
+    elif s.find(subStr) != -1:
+        return s[s.find(subStr) : ]
+    else:
+        return ''
+
+# Copy of the meta tag parsing as it was before the single pass parser, used as the reference of the benchmark
+def referenceParseMetaTags(metaTag):
+
+    return [referenceExtractWord(metaTag, tag) for tag in ('-a ', '-t ', '-i ', '-e ', '-log', '-nc', '-s ', '-eu=',
+                                                           '-mineu=', '-maxeu=', '-minraw=', '-maxraw=', '-logdb=',
+                                                           '-logper=', '-onmsg=', '-offmsg=', '-area=', '-f=')]
+
+# Checks parseMetaTags against the matching rules and returns a message for every CustomerString that breaks them
+def checkMetaTags():
+
+    failures = []
+    for customerString, fields in metaTagRules:
+
+        parseMetaTags.cache_clear()
+        expected = noMetaTags._replace(**fields)
+        result = parseMetaTags(customerString)
+        if result != expected:
+            failures.append(repr(customerString) + ": expected " + str(expected) + ", got " + str(result))
+
+    return failures
+
+# Times parseMetaTags and the parser it replaced on count CustomerStrings, once drawn from a set of distinct strings
+# like the variables of a real project and once with every string unique
+# Returns the times of both parsers for both sets of strings
+def runMetaTagBenchmark(count = 1000000, distinct = 2000, seed = 0):
+
+    r = random.Random(seed)
+    pool = [' '.join(r.sample(metaTagParts, r.randint(1, 5))) for i in range(distinct)]
+    results = {}
+
+    for name, strings in (('shared', [r.choice(pool) for i in range(count)]),
+                          ('unique', [' '.join(r.sample(metaTagParts, r.randint(1, 5))) + ' -x=' + str(i) for i in range(count)])):
+
+        startTime = time.perf_counter()
+        for customerString in strings:
+            referenceParseMetaTags(customerString)
+        referenceSeconds = time.perf_counter() - startTime
+
+        parseMetaTags.cache_clear()
+        startTime = time.perf_counter()
+        for customerString in strings:
+            parseMetaTags(customerString)
+        seconds = time.perf_counter() - startTime
+
+        results[name] = {'referenceSeconds': round(referenceSeconds, 4), 'seconds': round(seconds, 4)}
+
+    return results
+
+#-----------------------------------------------------Main-----------------------------------------------------
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Generate synthetic XEF/ZEF projects and benchmark the XEF Parser.")
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    run = commands.add_parser('run', help = "Benchmark the export at several sizes and save the results to JSON")
+    run.add_argument('--sizes', type = int, nargs = '+', default = [10000, 100000, 1000000],
+                     help = "Number of HMI variables of every generated project (default: 10000 100000 1000000)")
+    run.add_argument('--format', choices = ['zef', 'xef'], default = 'zef', help = "File type of the generated projects")
+    run.add_argument('--backend', choices = ['lxml', 'stdlib'], default = None,
+                     help = "XML parser backend (default: lxml when it is installed, otherwise stdlib)")
+    run.add_argument('--repeat', type = int, default = 1, help = "Number of timed runs of every stage, the best is kept")
+    run.add_argument('--seed', type = int, default = 0, help = "Seed of the generated projects")
+    run.add_argument('--work-dir', default = None, help = "Directory for the generated files (default: a temporary directory)")
+    run.add_argument('--output', default = '-', help = "Path of the JSON results (default: standard output)")
+
+    memory = commands.add_parser('memory', help = "Check that the peak RSS of the parse does not grow with the file size")
+    memory.add_argument('--sizes', type = int, nargs = '+', default = [10000, 100000, 1000000],
+                        help = "Number of HMI variables of every generated project (default: 10000 100000 1000000)")
+    memory.add_argument('--format', choices = ['zef', 'xef'], default = 'zef', help = "File type of the generated projects")
+    memory.add_argument('--backend', choices = ['lxml', 'stdlib'], default = None,
+                        help = "XML parser backend (default: every backend that is installed)")
+    memory.add_argument('--tolerance', type = float, default = 8,
+                        help = "Largest growth of the peak RSS in MB from the smallest to the largest project")
+    memory.add_argument('--seed', type = int, default = 0, help = "Seed of the generated projects")
+    memory.add_argument('--work-dir', default = None, help = "Directory for the generated files (default: a temporary directory)")
+
+    metatags = commands.add_parser('metatags', help = "Check the meta tag matching rules and time parseMetaTags")
+    metatags.add_argument('--count', type = int, default = 1000000, help = "Number of CustomerStrings parsed")
+    metatags.add_argument('--distinct', type = int, default = 2000,
+                          help = "Number of different CustomerStrings of the shared set")
+    metatags.add_argument('--seed', type = int, default = 0, help = "Seed of the generated CustomerStrings")
+
+    rows = commands.add_parser('rows', help = "Measure the memory of the exported rows held as VijeoRow records and as lists")
+    rows.add_argument('--hmi', type = int, default = 100000, help = "Number of HMI variables of the generated project")
+    rows.add_argument('--format', choices = ['zef', 'xef'], default = 'zef', help = "File type of the generated project")
+    rows.add_argument('--backend', choices = ['lxml', 'stdlib'], default = None,
+                      help = "XML parser backend (default: lxml when it is installed, otherwise stdlib)")
+    rows.add_argument('--seed', type = int, default = 0, help = "Seed of the generated project")
+
+    # Used by the memory command to parse every project in a process of its own
+    parse = commands.add_parser('parse', help = "Stream the HMI variables of a project and print the peak RSS as JSON")
+    parse.add_argument('path', help = "Path of the XEF or ZEF project")
+    parse.add_argument('--backend', choices = ['lxml', 'stdlib'], default = None, help = "XML parser backend")
+
+    generate = commands.add_parser('generate', help = "Generate a single synthetic XEF or ZEF project")
+    generate.add_argument('path', help = "Path of the project, a .zef extension creates a ZEF file")
+    generate.add_argument('--hmi', type = int, required = True, help = "Number of HMI variables")
+    generate.add_argument('--other', type = int, default = None, help = "Number of variables that are not shared with the HMI")
+    generate.add_argument('--seed', type = int, default = 0, help = "Seed of the random generator")
+    generate.add_argument('--comment-ratio', type = float, default = 0.7, help = "Share of the variables with a comment")
+    generate.add_argument('--foreign-ratio', type = float, default = 0.05,
+                          help = "Share of the HMI variables with an address outside the %%M memory")
+    generate.add_argument('--struct-ratio', type = float, default = 0.0,
+                          help = "Share of the HMI variables that are DDT instances")
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        size = generateProject(args.path, args.hmi, args.other, args.seed, args.comment_ratio, args.foreign_ratio,
+                               args.struct_ratio)
+        print(args.path + ": " + str(size) + " bytes")
+        return 0
+
+    if args.command == 'metatags':
+
+        # The rules are checked first, a faster parser that matches differently is a failure
+        failures = checkMetaTags()
+        for failure in failures:
+            print("Rule broken: " + failure)
+        print(str(len(metaTagRules) - len(failures)) + " of " + str(len(metaTagRules)) + " meta tag rules pass.")
+
+        results = runMetaTagBenchmark(args.count, args.distinct, args.seed)
+        for name, result in results.items():
+            print(name + " strings: reference " + format(result['referenceSeconds'], '.2f') + " s, parseMetaTags "
+                  + format(result['seconds'], '.2f') + " s, " + format(result['referenceSeconds'] / max(result['seconds'], 1e-9), '.1f')
+                  + "x faster")
+
+        return 1 if len(failures) > 0 else 0
+
+    if args.command == 'rows':
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            path = os.path.join(tempDir, "rows_" + str(args.hmi) + "." + args.format)
+            generateProject(path, args.hmi, seed = args.seed)
+            results = measureRowMemory(path, args.backend)
+
+        count = max(results['rows'], 1)
+        print(str(results['rows']) + " rows: VijeoRow " + format(results['vijeoRow'] / count, '.0f') + " bytes per row, "
+              + "46 column list " + format(results['list'] / count, '.0f') + " bytes per row, "
+              + format(results['list'] / max(results['vijeoRow'], 1), '.1f') + "x smaller")
+        return 0
+
+    if args.command == 'parse':
+        json.dump({'hmiVariables': parseProject(args.path, args.backend), 'peakRSS': peakRSS()}, sys.stdout)
+        return 0
+
+    # Check the backend before anything is generated
+    try:
+        getBackend(args.backend)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.work_dir is not None:
+        os.makedirs(args.work_dir, exist_ok = True)
+
+    if args.command == 'memory':
+        backendNames = None if args.backend is None else [args.backend]
+        results, flat = runMemoryCheck(args.sizes, args.format, backendNames, args.tolerance * 1048576, args.work_dir,
+                                       args.seed)
+
+        for result in results:
+            print(result['backend'] + " " + str(result['size']) + " HMI variables (" + format(result['fileBytes'] / 1048576, '.1f')
+                  + " MB " + args.format + "): " + ('peak RSS not available' if result['peakRSS'] is None
+                                                     else format(result['peakRSS'] / 1048576, '.1f') + " MB peak RSS"))
+
+        if flat is None:
+            print("The peak RSS cannot be measured on this platform.")
+            return 0
+
+        print("Memory " + ("stays flat" if flat else "grows with the file size") + " (tolerance " + format(args.tolerance, 'g') + " MB).")
+        return 0 if flat else 1
+
+    results = runBenchmark(args.sizes, args.format, args.backend, args.repeat, args.work_dir, args.seed)
+
+    # Write the results as JSON
+    if args.output == '-':
+        json.dump(results, sys.stdout, indent = 2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as resultsFile:
+            json.dump(results, resultsFile, indent = 2)
+
+    return 0
+
+if __name__ == '__main__':
+
+    sys.exit(main())
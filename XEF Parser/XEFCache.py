@@ -0,0 +1,221 @@
+# Author: M. Adil Zafar Khan
+# Date: 26th October 2021
+# Description: On-disk cache of the parsed HMI variables of XEF/ZEF files. The variables of a file are saved in a compact
+# compressed binary file named after a hash of the file's content, so exporting an unchanged file again with other
+# options (alarm group, scan group, file name) skips the unzip and the XML parsing. The cache size is bounded and the
+# least recently used files are removed first.
+
+# Importing libraries (make sure any missing libraries are installed)
+import os
+import time
+import gzip
+import pickle
+import hashlib
+from itertools import islice
+
+#-----------------------------------------------------Functions-----------------------------------------------------
+
+# Cache of the parsed variables of XEF/ZEF files
+# Every cache file holds an info record followed by chunks of (name, typeName, address, comment, customerString) records
+# and a None marker at the end, the time a file was last used is its modification time
+class ParseCache:
+
+    # Version of the cache file format, files of another version are ignored
+    version = 1
+
+    # Age in seconds after which a temporary file is left over from a writer that crashed, a running writer keeps
+    # writing to its file so it is never this old
+    staleSeconds = 3600
+
+    # Initialize class
+    def __init__(self, directory, maxBytes = 512 * 1024 * 1024):
+
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok = True)
+
+    # Returns the hash of the content of a file, used as the key of the file in the cache
+    # checkCancel() is called before every chunk is read so hashing a big file can be stopped
+    def key(self, filePath, checkCancel = None):
+
+        digest = hashlib.blake2b(digest_size = 20)
+        with open(filePath, 'rb') as sourceFile:
+            while True:
+                if checkCancel is not None:
+                    checkCancel()
+                chunk = sourceFile.read(1048576)
+                if len(chunk) == 0:
+                    break
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    # Returns the path of the cache file of a key
+    def path(self, key):
+
+        return os.path.join(self.directory, key + '.xefcache')
+
+    # Returns (info, records) of a cached file, records is an iterator that reads the variables lazily
+    # Returns None if the file is not in the cache or its cache file cannot be read
+    # fallback() returns an iterator of all the records parsed from the file itself, it is used for the rest of the
+    # records if the cache file turns out to be damaged after some of them were read
+    def load(self, key, fallback = None):
+
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+
+        cacheFile = None
+        try:
+            cacheFile = gzip.open(path, 'rb')
+            info = pickle.load(cacheFile)
+            if not isinstance(info, dict) or info.get('version') != self.version:
+                raise ValueError("Unknown cache file version")
+
+        # Any error means the file is damaged or was written by another version, it is parsed and saved again
+        except Exception:
+            if cacheFile is not None:
+                cacheFile.close()
+            self.remove(key)
+            return None
+
+        # Mark the file as recently used, another export may have evicted it in the meantime
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return info, self.records(key, cacheFile, fallback)
+
+    # Yields the records of an open cache file and closes it at the end
+    # If the file is damaged it is removed and the records that were not read yet come from fallback()
+    # Raises OSError if the file is damaged and there is no fallback
+    def records(self, key, cacheFile, fallback = None):
+
+        # Number of records read from the cache file
+        count = 0
+
+        with cacheFile:
+            while True:
+                try:
+                    chunk = pickle.load(cacheFile)
+                except Exception:
+                    chunk = False
+
+                # The end marker was reached
+                if chunk is None:
+                    return
+
+                # The file is damaged
+                if not isinstance(chunk, list):
+                    break
+
+                count += len(chunk)
+                yield from chunk
+
+        # Remove the damaged file so the next export saves it again
+        self.remove(key)
+        if fallback is None:
+            raise OSError("Cache file of " + key + " is damaged, export the file again.")
+
+        # Parse the file and skip the records that were already read from the cache
+        yield from islice(fallback(), count, None)
+
+    # Returns a writer that saves the records of a file to the cache while it is parsed
+    # info is saved with the records, it is only read when the first chunk is written so it can still be filled in
+    def writer(self, key, info):
+
+        return CacheWriter(self, key, info)
+
+    # Removes the cache file of a key
+    def remove(self, key):
+
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    # Removes the least recently used cache files until the cache fits in maxBytes and the temporary files left over by
+    # writers that crashed
+    # Several exports can share the cache, so files that another export removes in the meantime are skipped
+    def evict(self):
+
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+
+            try:
+                if name.endswith('.xefcache'):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, name))
+                elif name.endswith('.tmp') and now - os.stat(path).st_mtime > self.staleSeconds:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+
+        # Oldest first
+        entries.sort()
+        total = sum(entry[1] for entry in entries)
+
+        for mtime, size, name in entries:
+            if total <= self.maxBytes:
+                break
+
+            # The file is already gone or, on Windows, still open in another export
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+
+# Saves the records of a file to a temporary cache file in chunks, the file only replaces the cache file on commit
+class CacheWriter:
+
+    # Initialize class
+    def __init__(self, cache, key, info, chunkSize = 10000):
+
+        self.cache = cache
+        self.key = key
+        self.info = info
+        self.chunkSize = chunkSize
+
+        self.tempPath = cache.path(key) + '.' + str(os.getpid()) + '.tmp'
+        self.cacheFile = None
+        self.chunk = []
+
+    # Adds a record to the cache
+    def add(self, record):
+
+        self.chunk.append(record)
+        if len(self.chunk) == self.chunkSize:
+            self.flush()
+
+    # Writes the records that are waiting to the temporary file
+    def flush(self):
+
+        # Write the info record first
+        if self.cacheFile is None:
+            self.cacheFile = gzip.open(self.tempPath, 'wb', compresslevel = 1)
+            pickle.dump(dict(self.info, version = self.cache.version), self.cacheFile, pickle.HIGHEST_PROTOCOL)
+
+        if len(self.chunk) > 0:
+            pickle.dump(self.chunk, self.cacheFile, pickle.HIGHEST_PROTOCOL)
+            self.chunk = []
+
+    # Completes the cache file and removes the least recently used files if the cache is too big
+    def commit(self):
+
+        self.flush()
+        pickle.dump(None, self.cacheFile)
+        self.cacheFile.close()
+
+        os.replace(self.tempPath, self.cache.path(self.key))
+        self.cache.evict()
+
+    # Removes the temporary file when the file could not be parsed to the end
+    def abort(self):
+
+        if self.cacheFile is not None:
+            self.cacheFile.close()
+            os.remove(self.tempPath)
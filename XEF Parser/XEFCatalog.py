@@ -0,0 +1,248 @@
+# Author: M. Adil Zafar Khan
+# Date: 26th October 2021
+# Description: Persistent SQLite catalog of the variables of all the exported PLC projects. Every export in catalog mode
+# loads the variables of its project into an indexed database so questions across projects (which projects use an
+# address, all the trips, tags without a comment) are answered without parsing the XEF/ZEF files again.
+#
+# Usage: python XEFCatalog.py catalog.db projects
+#        python XEFCatalog.py catalog.db address %MW100
+#        python XEFCatalog.py catalog.db severity 20
+#        python XEFCatalog.py catalog.db no-comment [--project NAME]
+
+# Importing libraries (make sure any missing libraries are installed)
+import sys
+import time
+import sqlite3
+import argparse
+from XEFHandler import decodeAddress
+
+#-----------------------------------------------------Functions-----------------------------------------------------
+
+# Tables and indexes of the catalog
+# A project is only visible to the queries once all its variables are loaded (complete = 1)
+# memory, startBit and endBit are the decoded address so overlapping addresses can be found with a range query
+schema = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    project TEXT,
+    source TEXT,
+    loaded TEXT,
+    variables INTEGER DEFAULT 0,
+    complete INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tags (
+    projectId INTEGER NOT NULL REFERENCES projects(id),
+    name TEXT NOT NULL,
+    address TEXT,
+    memory TEXT,
+    startBit INTEGER,
+    endBit INTEGER,
+    dataType TEXT,
+    description TEXT,
+    severity INTEGER,
+    alarm INTEGER,
+    trip INTEGER,
+    info INTEGER,
+    event INTEGER,
+    log INTEGER,
+    noComm INTEGER,
+    status INTEGER,
+    alarmGroup TEXT,
+    scanGroup TEXT,
+    logGroup TEXT,
+    logPer TEXT,
+    logDb TEXT,
+    eu TEXT,
+    plantArea TEXT
+);
+CREATE INDEX IF NOT EXISTS projectsKey ON projects(key);
+CREATE INDEX IF NOT EXISTS tagsProject ON tags(projectId);
+CREATE INDEX IF NOT EXISTS tagsName ON tags(name);
+CREATE INDEX IF NOT EXISTS tagsAddress ON tags(address);
+CREATE INDEX IF NOT EXISTS tagsMemory ON tags(memory, startBit);
+CREATE INDEX IF NOT EXISTS tagsSeverity ON tags(severity) WHERE severity IS NOT NULL;
+CREATE INDEX IF NOT EXISTS tagsNoComment ON tags(projectId) WHERE description IS NULL OR description = '';
+"""
+
+# Columns of the tags table filled from every row
+tagColumns = ['projectId', 'name', 'address', 'memory', 'startBit', 'endBit', 'dataType', 'description', 'severity',
+              'alarm', 'trip', 'info', 'event', 'log', 'noComm', 'status', 'alarmGroup', 'scanGroup', 'logGroup',
+              'logPer', 'logDb', 'eu', 'plantArea']
+
+insertTag = "INSERT INTO tags (" + ", ".join(tagColumns) + ") VALUES (" + ", ".join('?' * len(tagColumns)) + ")"
+
+# Columns returned by the tag queries
+resultColumns = "p.key, p.project, t.name, t.address, t.dataType, t.description, t.severity"
+
+# Catalog of the variables of all the exported projects
+# Projects are loaded in batches of batchSize variables, every batch is its own short transaction so several exports can
+# share the database, and the previous load of the same project is only replaced once the new load is complete
+class TagCatalog:
+
+    # Initialize class
+    def __init__(self, path, batchSize = 5000):
+
+        self.path = path
+        self.batchSize = batchSize
+
+        # Wait for other exports that are writing a batch instead of failing straight away
+        self.connection = sqlite3.connect(path, timeout = 60)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(schema)
+
+    # Closes the database
+    def close(self):
+
+        self.connection.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc):
+
+        self.close()
+
+    # Converts a compact Vijeo row into the values of a tags row
+    @staticmethod
+    def tagValues(projectId, row):
+
+        decoded = decodeAddress(row.address) or (None, None, None)
+        meta = row.metaTags
+
+        return (projectId, row.name, row.address, decoded[0], decoded[1], decoded[2], row.dataType, row.description,
+                row.severity, meta.alarm, meta.trip, meta.info, meta.event, meta.log, meta.noComm, meta.status,
+                row.alarmGroup, row.scanGroup, row.logGroup, meta.logPer, meta.logDb, meta.eu, meta.area)
+
+    # Loads the rows of a project into the catalog while passing them on unchanged, so it can sit in front of the csv writer
+    # key names the project in the catalog (the csv file name), loading the same key again replaces its variables
+    # If the rows are not read to the end the partial load is removed and the previous load is kept
+    def track(self, rows, key, project, source):
+
+        connection = self.connection
+
+        # Register the new load, it stays hidden from the queries until it is complete
+        with connection:
+            projectId = connection.execute("INSERT INTO projects (key, project, source, loaded) VALUES (?, ?, ?, ?)",
+                                           (key, project, str(source), time.strftime('%Y-%m-%d %H:%M:%S'))).lastrowid
+
+        batch = []
+        count = 0
+        complete = False
+        try:
+            for row in rows:
+                batch.append(self.tagValues(projectId, row))
+
+                # Insert a full batch in its own transaction
+                if len(batch) == self.batchSize:
+                    with connection:
+                        connection.executemany(insertTag, batch)
+                    count += len(batch)
+                    batch = []
+
+                yield row
+
+            # Insert the last batch and swap the previous load of the project for the new one
+            with connection:
+                connection.executemany(insertTag, batch)
+                count += len(batch)
+                connection.execute("DELETE FROM tags WHERE projectId IN (SELECT id FROM projects WHERE key = ? AND id != ?)",
+                                   (key, projectId))
+                connection.execute("DELETE FROM projects WHERE key = ? AND id != ?", (key, projectId))
+                connection.execute("UPDATE projects SET variables = ?, complete = 1 WHERE id = ?", (count, projectId))
+            complete = True
+
+        finally:
+            # Remove the partial load if the export failed or was cancelled
+            if not complete:
+                with connection:
+                    connection.execute("DELETE FROM tags WHERE projectId = ?", (projectId,))
+                    connection.execute("DELETE FROM projects WHERE id = ?", (projectId,))
+
+    # Returns (key, project, source, loaded, variables) of every complete project
+    def projects(self):
+
+        return self.connection.execute("SELECT key, project, source, loaded, variables FROM projects "
+                                       "WHERE complete = 1 ORDER BY key").fetchall()
+
+    # Returns the variables of every project whose memory overlaps the given address
+    # A %MW word also finds the %MD/%MF double words and the word bits that share its memory
+    # Raises ValueError if the address is not a %M memory address
+    def tagsAtAddress(self, address):
+
+        decoded = decodeAddress(address)
+        if decoded is None:
+            raise ValueError("Cannot decode the address " + address)
+
+        memory, startBit, endBit = decoded
+        memories = ('M',) if memory == 'M' else ('MW', 'MW.X')
+
+        return self.connection.execute("SELECT " + resultColumns + " FROM tags t JOIN projects p ON p.id = t.projectId "
+                                       "WHERE p.complete = 1 AND t.memory IN (?, ?) AND t.startBit < ? AND t.endBit > ? "
+                                       "ORDER BY p.key, t.startBit",
+                                       (memories[0], memories[-1], endBit, startBit)).fetchall()
+
+    # Returns the variables of every project with the given alarm severity (20 trip, 10 alarm, 1 event)
+    def tagsWithSeverity(self, severity):
+
+        return self.connection.execute("SELECT " + resultColumns + " FROM tags t JOIN projects p ON p.id = t.projectId "
+                                       "WHERE p.complete = 1 AND t.severity = ? ORDER BY p.key, t.name",
+                                       (severity,)).fetchall()
+
+    # Returns the variables without a comment, of one project if a key is given or else of every project
+    def tagsWithoutComment(self, key = None):
+
+        query = ("SELECT " + resultColumns + " FROM tags t JOIN projects p ON p.id = t.projectId "
+                 "WHERE p.complete = 1 AND (t.description IS NULL OR t.description = '')")
+        if key is None:
+            return self.connection.execute(query + " ORDER BY p.key, t.name").fetchall()
+
+        return self.connection.execute(query + " AND p.key = ? ORDER BY t.name", (key,)).fetchall()
+
+#-----------------------------------------------------Main-----------------------------------------------------
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Query the tag catalog of the exported PLC projects.")
+    parser.add_argument('catalog', help = "Path of the catalog database")
+    queries = parser.add_subparsers(dest = 'query', required = True)
+
+    queries.add_parser('projects', help = "List the projects in the catalog")
+    address = queries.add_parser('address', help = "Variables of every project that use the memory of an address")
+    address.add_argument('address', help = "Memory address, for example %%MW100")
+    severity = queries.add_parser('severity', help = "Variables of every project with an alarm severity")
+    severity.add_argument('severity', type = int, choices = [1, 10, 20], help = "20 trip, 10 alarm, 1 event")
+    noComment = queries.add_parser('no-comment', help = "Variables without a comment")
+    noComment.add_argument('--project', default = None, help = "Only list the variables of this project")
+    args = parser.parse_args(argv)
+
+    with TagCatalog(args.catalog) as catalog:
+
+        startTime = time.perf_counter()
+
+        if args.query == 'projects':
+            results = catalog.projects()
+        elif args.query == 'address':
+            try:
+                results = catalog.tagsAtAddress(args.address)
+            except ValueError as e:
+                parser.error(str(e))
+        elif args.query == 'severity':
+            results = catalog.tagsWithSeverity(args.severity)
+        else:
+            results = catalog.tagsWithoutComment(args.project)
+
+        seconds = time.perf_counter() - startTime
+
+    # Print the results as tab separated lines
+    for result in results:
+        print('\t'.join('' if value is None else str(value) for value in result))
+
+    print(str(len(results)) + " results in " + format(seconds * 1000, '.1f') + " ms", file = sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,1310 @@
+# Author: M. Adil Zafar Khan
+# Date: 26th October 2021
+# Description: Parsing core of the XEF Parser. Takes a PLC XEF or ZEF file and creates a CSV file with all the HMI variables
+# to be exported to Vijeo Designer. It has no dependency on tkinter so it can be used by the GUI and by headless tools.
+
+# Importing libraries (make sure any missing libraries are installed)
+import os
+import csv
+import json
+import re
+import hashlib
+import time
+import zipfile
+from functools import lru_cache
+from itertools import chain
+from collections import namedtuple, deque
+from pathlib import Path
+import xml.etree.ElementTree as ET
+from XEFSections import SectionIndex, TypeLayouts, isElementary, fieldAddress, fieldSeparator, joinComments
+
+# lxml is optional, the standard library parser is used when it is not installed
+try:
+    from lxml import etree as lxmlTree
+except ImportError:
+    lxmlTree = None
+
+#-----------------------------------------------------Functions-----------------------------------------------------
+
+# Define all the fields/columns for the csv
+fields = ["Type", "Name","Data Type", "Data Source",
+          "Dimension", "Description", "Initial Value",
+          "NumofBytes", "Data Sharing", "Alarm", "English ID",
+          "Alarm Message", "Alarm Type", "Trigger Condition",
+          "Deadband", "Target", "LoLo\\Lo\\Hi\\HiHi", "Minor",
+          "Major", "Alarm Group", "Severity", "Vibration Pattern",
+          "Vibration Time","Sound File","Play Mode","Scan Group",
+          "Device Address", "Bit Number", "Data Format", "Signed",
+          "Data Length", "Offset Bit No", "Bit Width", "InputRange",
+          "Min", "Max", "DataScaling", "RawMin", "RawMax", "ScaledMin",
+          "ScaledMax", "IndirectEnabled", "IndirectAddress","Retentive",
+          "LoggingGroup", "LogUserOperationsOnVariable"]
+
+# Creates a new Vijeo csv file, writes the header rows and returns the file together with its csv writer
+def openVijeoCSV(projectName, filename):
+
+    # Create a new csv file, the large buffer keeps the number of writes to the disk low
+    csvfile = open(filename, 'w', newline="", buffering=1048576)
+
+    # creating a csv writer object
+    writer = csv.writer(csvfile)
+
+    # writing headers
+    writer.writerow(["'5.1.0", "Vijeo-Designer 6.2.11 CSV output"])
+    writer.writerow(fields)
+    writer.writerow(["Folder", projectName] + [''] * 44)
+
+    return csvfile, writer
+
+# Takes a 2D list or any iterable of rows and saves the rows to a csv file
+# Rows are written as soon as they are produced so a generator of rows is never held in memory
+# Returns the number of rows written
+def savetoCSV(projectName, listItems, filename):
+
+    # Number of rows written
+    rowCount = 0
+
+    csvfile, writer = openVijeoCSV(projectName, filename)
+    with csvfile:
+
+        # writing data rows
+        for row in listItems:
+            writer.writerow(row)
+            rowCount += 1
+
+    return rowCount
+
+# Record of all the meta tags that can be set in the CustomerString of a variable
+# Flags are stored as booleans and tags with an '=' store the text after the '='
+MetaTags = namedtuple('MetaTags', ['alarm', 'trip', 'info', 'event', 'log', 'noComm', 'status',
+                                   'eu', 'minEu', 'maxEu', 'minRaw', 'maxRaw', 'logDb', 'logPer',
+                                   'onMsg', 'offMsg', 'area', 'format'])
+
+# Position of every flag tag in the MetaTags record
+metaFlags = {'-a': 0, '-t': 1, '-i': 2, '-e': 3, '-log': 4, '-nc': 5, '-s': 6}
+
+# Position of every tag with a value in the MetaTags record
+metaValues = {'-eu': 7, '-mineu': 8, '-maxeu': 9, '-minraw': 10, '-maxraw': 11, '-logdb': 12,
+              '-logper': 13, '-onmsg': 14, '-offmsg': 15, '-area': 16, '-f': 17}
+
+# Meta tags of a variable that does not have a CustomerString
+noMetaTags = MetaTags(*([False] * len(metaFlags) + [''] * len(metaValues)))
+
+# Takes in a CustomerString and splits it into its tags in a single pass
+# Variables often share the same CustomerString so the results are cached on the raw string
+@lru_cache(maxsize=4096)
+def parseMetaTags(metaTag):
+
+    tagList = list(noMetaTags)
+
+    # Every tag is a separate word so only exact matches count ('-a' does not match '-area=')
+    for word in metaTag.split():
+
+        # Flag tags like '-a' or '-log'
+        if word in metaFlags:
+            tagList[metaFlags[word]] = True
+            continue
+
+        # Tags with a value like '-eu=bar', the first occurrence of a tag is kept
+        key, equals, value = word.partition('=')
+        if equals and key in metaValues and tagList[metaValues[key]] == '':
+            tagList[metaValues[key]] = value
+
+    # Return the filled record
+    return MetaTags._make(tagList)
+
+# Opens the XEF file to be parsed and returns the file object along with the name of the XEF file
+# A ZEF file is read in place and only its XEF member is streamed, nothing is copied or extracted to disk
+# filePath can also be an open binary file object of an XEF or ZEF file, which is then read from directly
+def openXef(filePath):
+
+    # Check if a file object was passed
+    if hasattr(filePath, 'read'):
+        name = getattr(filePath, 'name', '')
+
+        # A file object that is not a zip archive is the XEF file itself
+        if not (filePath.seekable() and zipfile.is_zipfile(filePath)):
+            if filePath.seekable():
+                filePath.seek(0)
+            return filePath, name
+
+    # Check if the file has a .zef extension
+    elif Path(filePath).suffix != '.zef':
+        return open(filePath, 'rb'), filePath
+
+    with zipfile.ZipFile(filePath, 'r') as zip_ref:
+
+        # Find the XEF file in the root of the ZEF file
+        for name in zip_ref.namelist():
+            if '/' not in name and Path(name).suffix == '.xef':
+                # The opened member stays readable after the archive itself is closed
+                return zip_ref.open(name), name
+
+    raise FileNotFoundError("No XEF file found in " + str(getattr(filePath, 'name', filePath)))
+
+# Binary file object that calls checkCancel() before every read so a long read of the file can be stopped, even in the
+# parts of the file where no HMI variable is found
+class CancellableReader:
+
+    # Initialize class
+    def __init__(self, fileObject, checkCancel):
+
+        self.fileObject = fileObject
+        self.checkCancel = checkCancel
+
+    # Checks for a cancel and reads from the file
+    def read(self, size = -1):
+
+        self.checkCancel()
+        return self.fileObject.read(size)
+
+    # Every other attribute (seek, close, name, ...) is the one of the file
+    def __getattr__(self, name):
+        return getattr(self.fileObject, name)
+
+# Reads the children of a variable element in a single pass
+# Returns if the variable has the HMI attribute, its comment and its CustomerString (meta tags),
+# the comment and the CustomerString are None if the variable does not have them
+def readVariable(variable):
+
+    isHMI = False
+    hasComment = False
+    comment = None
+    customerString = None
+
+    for child in variable:
+        tag = child.tag
+
+        if tag == 'attribute':
+            name = child.get('name')
+            if name == 'IsVariableHMI':
+                isHMI = True
+            # Only the first CustomerString is used
+            elif name == 'CustomerString' and customerString is None:
+                customerString = child.get('value', '')
+
+        # Only the first comment is used
+        elif tag == 'comment' and not hasComment:
+            hasComment = True
+            comment = child.text
+
+    return isHMI, comment, customerString
+
+# Streams the XEF file and yields the HMI variables of the dataBlock one at a time
+# as (name, typeName, address, comment, customerString) records
+# Every element that is not part of a dataBlock variable is cleared as soon as it has been read so memory stays flat
+# The attributes of the contentHeader element are copied into the header dictionary when it is reached
+def iterHMIVariables(source, header):
+
+    # Stack of the elements that are currently open
+    stack = []
+    # The dataBlock variable element that is currently being read
+    variable = None
+
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+
+        if event == 'start':
+
+            # The contentHeader is a direct child of the root element
+            if len(stack) == 1 and elem.tag == 'contentHeader':
+                header.update(elem.attrib)
+
+            # Only keep the variables that are direct children of a top level dataBlock
+            elif len(stack) == 2 and elem.tag == 'variables' and stack[1].tag == 'dataBlock':
+                variable = elem
+
+            stack.append(elem)
+            continue
+
+        stack.pop()
+
+        # Keep the children of the current variable until the variable itself is complete
+        if variable is not None and elem is not variable:
+            continue
+
+        if elem is variable:
+            variable = None
+
+            # Yield the variable if it has the HMI attribute
+            isHMI, comment, customerString = readVariable(elem)
+            if isHMI:
+                yield elem.get('name'), elem.get('typeName'), elem.get('topologicalAddress'), comment, customerString
+
+        # Drop the element and its children from the parent since they are no longer needed
+        elem.clear()
+        if stack:
+            stack[-1].clear()
+
+# Same as iterHMIVariables but uses the C iterparse of lxml
+# Every element is cleared and removed from its parent once it has been read, including the sections after the
+# dataBlock, so memory stays flat whatever the size and layout of the file
+# Raises ET.ParseError like the standard library backend so callers do not need to know which backend is used
+def iterHMIVariablesLxml(source, header):
+
+    # Number of elements that are currently open
+    depth = 0
+    # The dataBlock variable element that is currently being read
+    variable = None
+
+    try:
+        for event, elem in lxmlTree.iterparse(source, events=('start', 'end'), huge_tree=True, resolve_entities=False):
+
+            if event == 'start':
+
+                # The contentHeader is a direct child of the root element
+                if depth == 1 and elem.tag == 'contentHeader':
+                    header.update(elem.attrib)
+
+                # Only keep the variables that are direct children of a top level dataBlock
+                elif depth == 2 and elem.tag == 'variables' and elem.getparent().tag == 'dataBlock':
+                    variable = elem
+
+                depth += 1
+                continue
+
+            depth -= 1
+
+            # Keep the children of the current variable until the variable itself is complete
+            if variable is not None:
+                if elem is not variable:
+                    continue
+                variable = None
+
+                # Yield the variable if it has the HMI attribute
+                isHMI, comment, customerString = readVariable(elem)
+                if isHMI:
+                    yield elem.get('name'), elem.get('typeName'), elem.get('topologicalAddress'), comment, customerString
+
+            # Drop the element and the siblings before it since they are no longer needed
+            elem.clear(keep_tail=False)
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+    except lxmlTree.XMLSyntaxError as e:
+        raise ET.ParseError(str(e)) from e
+
+# XML backend of the parser, iterVariables streams the HMI variables of an XEF file
+XmlBackend = namedtuple('XmlBackend', ['name', 'iterVariables'])
+
+# Backends that can be used by the parser, lxml is only available when it is installed
+backends = {'stdlib': XmlBackend('stdlib', iterHMIVariables)}
+if lxmlTree is not None:
+    backends['lxml'] = XmlBackend('lxml', iterHMIVariablesLxml)
+
+# Returns the XML backend with the given name, lxml is used by default when it is installed
+# Raises ValueError if the backend does not exist or lxml is not installed
+def getBackend(name = None):
+
+    if name is None:
+        name = 'stdlib' if lxmlTree is None else 'lxml'
+
+    if name not in backends:
+        raise ValueError("XML backend '" + name + "' is not available")
+
+    return backends[name]
+
+# Base class of the output writers
+# A writer is opened once per export and gets every exported row in turn, so one parse can feed several output formats
+# New formats are added by subclassing RowWriter and registering the class in the writers dictionary
+class RowWriter:
+
+    # Name of the format and end of the file name of its output file
+    name = ''
+    suffix = ''
+
+    # Initialize class
+    def __init__(self, projectName, path):
+
+        self.projectName = projectName
+        self.path = path
+
+    # Writes a single row
+    def write(self, row):
+        raise NotImplementedError
+
+    # Closes the output file
+    def close(self):
+        self.file.close()
+
+    # Closes and removes a half written output file
+    def abort(self):
+
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+# Writes the Vijeo-Designer 6.2.11 csv
+class VijeoWriter(RowWriter):
+
+    name = 'vijeo'
+    suffix = '_Vijeo_Export.csv'
+
+    # Initialize class
+    def __init__(self, projectName, path):
+
+        RowWriter.__init__(self, projectName, path)
+        self.file, writer = openVijeoCSV(projectName, path)
+
+        # The rows are iterable so they go straight to the csv writer
+        self.write = writer.writerow
+
+# Writes one JSON object per variable with all its meta tags
+class JsonLinesWriter(RowWriter):
+
+    name = 'jsonl'
+    suffix = '_Tags.jsonl'
+
+    # Initialize class
+    def __init__(self, projectName, path):
+
+        RowWriter.__init__(self, projectName, path)
+        self.file = open(path, 'w', encoding = 'utf-8', buffering = 1048576)
+        self.encode = json.JSONEncoder(ensure_ascii = False).encode
+
+        # Encoded meta tags, variables with the same CustomerString share their MetaTags record so each one is only
+        # encoded once
+        self.encodedMetaTags = {}
+
+    # Writes a single row
+    def write(self, row):
+
+        metaTags = self.encodedMetaTags.get(row.metaTags)
+        if metaTags is None:
+            metaTags = self.encodedMetaTags[row.metaTags] = self.encode(row.metaTags._asdict())
+
+        # Encode the variable fields and add the meta tags in front of the closing brace
+        line = self.encode({'name': row.name, 'dataType': row.dataType, 'address': row.address,
+                            'description': row.description, 'severity': row.severity, 'alarmGroup': row.alarmGroup,
+                            'scanGroup': row.scanGroup, 'logGroup': row.logGroup})
+        self.file.write(line[:-1] + ', "metaTags": ' + metaTags + '}\n')
+
+# Writes a generic tag list csv with one plain column per field, for SCADA systems that do not read the Vijeo layout
+# The Meta Tags column holds the CustomerString as it is in the XEF, so an edited tag list can be applied back with XEFApply
+class TagListWriter(RowWriter):
+
+    name = 'taglist'
+    suffix = '_Tag_List.csv'
+
+    # Columns of the tag list
+    columns = ["Name", "Address", "Data Type", "Description", "Severity", "Alarm Group", "Scan Group", "Logging Group",
+               "Min", "Max", "Min Raw", "Max Raw", "EU", "Plant Area", "Format", "On Message", "Off Message", "Meta Tags"]
+
+    # Initialize class
+    def __init__(self, projectName, path):
+
+        RowWriter.__init__(self, projectName, path)
+        self.file = open(path, 'w', newline = "", buffering = 1048576)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.columns)
+
+    # Writes a single row
+    def write(self, row):
+
+        meta = row.metaTags
+        self.writer.writerow((row.name, row.address, row.dataType, row.description,
+                              '' if row.severity is None else row.severity, row.alarmGroup, row.scanGroup, row.logGroup,
+                              meta.minEu, meta.maxEu, meta.minRaw, meta.maxRaw, meta.eu, meta.area, meta.format,
+                              meta.onMsg, meta.offMsg, row.customerString))
+
+# Output writers by format name
+writers = {writer.name: writer for writer in (VijeoWriter, JsonLinesWriter, TagListWriter)}
+
+# Returns the writer class of a format name
+# Raises ValueError if the format is unknown
+def getWriter(name):
+
+    if name not in writers:
+        raise ValueError("Unknown output format " + repr(name) + ", choose from " + ", ".join(sorted(writers)))
+
+    return writers[name]
+
+# Streams the rows into every writer in a single pass and returns the number of rows written
+def writeRows(rows, outputs):
+
+    # Number of rows written
+    rowCount = 0
+
+    # Bind the write methods once, they are called for every row
+    writes = [output.write for output in outputs]
+
+    for row in rows:
+        for write in writes:
+            write(row)
+        rowCount += 1
+
+    return rowCount
+
+# Compact row of a single exported variable
+# Only the fields that change from one variable to the next are stored, the constant columns of the
+# 46 column Vijeo row are filled in when the row is written
+class VijeoRow:
+
+    __slots__ = ('name', 'dataType', 'address', 'description', 'severity', 'alarmGroup', 'scanGroup',
+                 'logGroup', 'minEu', 'maxEu', 'metaTags', 'customerString', 'fingerprint')
+
+    # Initialize class
+    def __init__(self, name, dataType, address, scanGroup):
+
+        self.name = name
+        self.dataType = dataType
+        self.address = address
+        self.scanGroup = scanGroup
+
+        # Description, alarm and logging fields are empty until they are set by the parser
+        # The severity is None for variables that are not an alarm, event or trip
+        self.description = ''
+        self.severity = None
+        self.alarmGroup = ''
+        self.logGroup = ''
+        self.minEu = ''
+        self.maxEu = ''
+
+        # Meta tags of the variable, shared with every variable that has the same CustomerString
+        self.metaTags = noMetaTags
+        self.customerString = ''
+
+        # Hash of the raw variable, only set when the parser is asked for fingerprints
+        self.fingerprint = None
+
+    # Builds the full 46 column Vijeo row
+    def toList(self):
+
+        rowList = [''] * 46
+
+        # Fixed Values of columns 1, 4, 5, 11, 42 and the per variable columns
+        rowList[0] = "Variable"
+        rowList[1] = self.name
+        rowList[2] = self.dataType
+        rowList[3] = "External"
+        rowList[4] = 0
+        rowList[5] = self.description
+        rowList[10] = 1
+        rowList[25] = self.scanGroup
+        rowList[26] = self.address
+        rowList[34] = self.minEu
+        rowList[35] = self.maxEu
+        rowList[41] = "Disable"
+        rowList[44] = self.logGroup
+
+        # Check if the variable is an alarm, event or trip
+        if self.severity is not None:
+
+            # Fixed values for the alarm, event or trip variables
+            rowList[9] = "Enable"
+            # Copy the description to the alarm message
+            rowList[11] = self.description
+            rowList[13] = "when high"
+            rowList[16] = "_\\_\\_\\_"
+            rowList[19] = self.alarmGroup
+            rowList[20] = self.severity
+
+        else:
+            # Disable the alarm
+            rowList[9] = "Disable"
+
+        # If variable type is not BOOL
+        if self.dataType != 'BOOL':
+
+            # If it is UDINT, set data length to 32 bits
+            if self.dataType == 'UDINT':
+                rowList[30] = "32Bits"
+
+            # If it is REAL, leave the column empty
+            elif self.dataType == 'REAL':
+                pass
+
+            # If it is INT or UINT, set data length to 16 bits
+            else:
+                rowList[30] = "16Bits"
+
+            # Disable the input range
+            rowList[33] = "Disable"
+
+        return rowList
+
+    # Lets the csv writer write the row directly
+    def __iter__(self):
+        return iter(self.toList())
+
+# Word address of a structured variable located in %MW memory
+structureAddressPattern = re.compile(r'%MW(\d+)$', re.IGNORECASE)
+
+# Matches the located memory addresses %M, %MW, %MD and %MF and the bit extract of a word (%MW10.3 or %MW10.X3)
+addressPattern = re.compile(r'%M([WDF]?)(\d+)(?:\.X?(\d+))?$', re.IGNORECASE)
+
+# Decodes a memory address into its memory area and the position of its first bit and the bit after its last bit
+# %M bits and %MW words are separate memory areas, a %MD or %MF takes two words and a word bit is a single bit of a word
+# Bit extracts of words are kept in their own area since reading a word and one of its bits is not a collision
+# Returns None if the address cannot be decoded
+def decodeAddress(address):
+
+    match = addressPattern.match(address)
+    if match is None:
+        return None
+
+    size, offset, bit = match.group(1).upper(), int(match.group(2)), match.group(3)
+
+    # %M memory bit
+    if size == '':
+        return None if bit is not None else ('M', offset, offset + 1)
+
+    # Bit of a %MW word
+    if bit is not None:
+        if size != 'W' or int(bit) > 15:
+            return None
+        return ('MW.X', offset * 16 + int(bit), offset * 16 + int(bit) + 1)
+
+    # %MW word or %MD/%MF double word
+    return ('MW', offset * 16, offset * 16 + (16 if size == 'W' else 32))
+
+# Block of neighbouring memory read with a single request, start and end are in bits for %M and in words for %MW
+ScanBlock = namedtuple('ScanBlock', ['area', 'start', 'end', 'names'])
+
+# Logging Group of the packed logged variables
+LogGroup = namedtuple('LogGroup', ['name', 'logPer', 'logDb', 'count'])
+
+# Packs the logged variables into Logging Groups in a single pass as the rows are streamed
+# Vijeo will not build a Logging Group with more than maxSize variables, so a new group is opened when one is full
+# Variables are only packed together when they have the same logging period and database so fast and slow loggers are not mixed
+# The groups are numbered from the user given name: groupLog, groupLog_2, groupLog_3, ...
+class LogGroupPacker:
+
+    # Initialize class
+    def __init__(self, groupLog, maxSize = 100):
+
+        self.groupLog = groupLog
+        self.maxSize = maxSize
+
+        # Names, logging periods, databases and counts of all the groups in the order they were opened
+        self.names = []
+        self.keys = []
+        self.counts = []
+
+        # Index of the group that is being filled for every (logging period, database) pair
+        self.open = {}
+
+    # Returns the Logging Group name of a logged variable
+    def assign(self, logPer, logDb):
+
+        key = (logPer, logDb)
+        index = self.open.get(key)
+
+        # Open a new group if there is no group for this logging period and database or the group is full
+        if index is None or self.counts[index] >= self.maxSize:
+            index = len(self.names)
+            self.names.append(self.groupLog if index == 0 else self.groupLog + '_' + str(index + 1))
+            self.keys.append(key)
+            self.counts.append(0)
+            self.open[key] = index
+
+        self.counts[index] += 1
+        return self.names[index]
+
+    # Returns all the groups that were opened
+    def groups(self):
+
+        return [LogGroup(name, key[0], key[1], count) for name, key, count in zip(self.names, self.keys, self.counts)]
+
+# Index of the memory addresses of all the exported variables, used to find variables that share memory
+class AddressIndex:
+
+    # Initialize class
+    def __init__(self):
+
+        # Intervals of every memory area as (first bit, bit after the last bit, variable name, address)
+        self.areas = {}
+
+    # Adds the address of a variable to the index, returns False if the address cannot be decoded
+    def add(self, name, address):
+
+        decoded = decodeAddress(address)
+        if decoded is None:
+            return False
+
+        area, start, end = decoded
+        self.areas.setdefault(area, []).append((start, end, name, address))
+        return True
+
+    # Returns a list of (kind, variable, other variable) tuples for all the variables whose memory collides with an
+    # earlier variable, kind is 'duplicate' when both use exactly the same memory and 'overlap' otherwise
+    # Every area is sorted once and swept once so the check takes O(n log n) instead of comparing every pair
+    def collisions(self):
+
+        collisionList = []
+
+        for intervals in self.areas.values():
+            intervals.sort()
+
+            # Interval that reaches the furthest so far in the sweep and the first interval of the last run of
+            # intervals that use exactly the same memory, once sorted those runs are next to each other
+            furthest = None
+            previous = None
+
+            for interval in intervals:
+
+                # The interval uses the same memory as the interval before it
+                if previous is not None and interval[:2] == previous[:2]:
+                    collisionList.append(('duplicate', interval, previous))
+                    continue
+
+                # The interval starts before the furthest interval ends so they share memory
+                if furthest is not None and interval[0] < furthest[1]:
+                    collisionList.append(('overlap', interval, furthest))
+
+                previous = interval
+                if furthest is None or interval[1] > furthest[1]:
+                    furthest = interval
+
+        return collisionList
+
+    # Groups the addresses into blocks of neighbouring memory that can each be read with a single request
+    # A block never spans more than maxWords words (%MW) or maxBits bits (%M) and only bridges gaps of up to
+    # maxGap unused words (maxGap * 16 unused bits for %M), bit extracts are read together with their word
+    # Returns a list of ScanBlock records sorted by memory area and address
+    def planBlocks(self, maxWords = 125, maxBits = 2000, maxGap = 8):
+
+        # Addresses of every area in the unit of its requests
+        items = {'M': [], 'MW': []}
+        for area, intervals in self.areas.items():
+            for start, end, name, address in intervals:
+                if area == 'M':
+                    items['M'].append((start, end, name))
+                else:
+                    items['MW'].append((start // 16, (end + 15) // 16, name))
+
+        blocks = []
+        for area, maxSize, gap in (('M', maxBits, maxGap * 16), ('MW', maxWords, maxGap)):
+
+            # Block that is currently being filled as [start, end, names]
+            block = None
+
+            for start, end, name in sorted(items[area]):
+
+                # Add the address to the current block if the gap is small enough and the block does not get too big
+                if block is not None and start - block[1] <= gap and max(end, block[1]) - block[0] <= maxSize:
+                    block[1] = max(end, block[1])
+                    block[2].append(name)
+
+                # Otherwise start a new block
+                else:
+                    if block is not None:
+                        blocks.append(ScanBlock(area, *block))
+                    block = [start, end, [name]]
+
+            if block is not None:
+                blocks.append(ScanBlock(area, *block))
+
+        return blocks
+
+# Returns a short hash of the raw fields of a variable
+def fingerprint(*fields):
+
+    # Join the fields with a separator that cannot appear in the XEF so different splits never collide
+    text = '\x1f'.join('' if field is None else field for field in fields)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size = 16).hexdigest()
+
+# Raised by the parser when the export is cancelled by the user
+class ExportCancelled(Exception):
+    pass
+
+# Wall time and item count of every stage of an export, in the order the stages were first recorded
+class ExportStats:
+
+    # Initialize class
+    def __init__(self):
+
+        # Stage name mapped to [seconds, count]
+        self.stages = {}
+
+    # Adds the time and the number of items of a stage, a stage that is recorded again is summed up
+    def add(self, stage, seconds, count = 1):
+
+        entry = self.stages.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += count
+
+    # Returns the total time of all the stages
+    def total(self):
+
+        return sum(entry[0] for entry in self.stages.values())
+
+    # Returns the stages as a dictionary that can be saved to JSON
+    def toDict(self):
+
+        return {stage: {'seconds': round(seconds, 4), 'count': count} for stage, (seconds, count) in self.stages.items()}
+
+# Parses an XEF or ZEF file and yields one Vijeo row per HMI variable
+# source is a file path or an open binary file object of an XEF or ZEF file
+# Warnings are passed to onWarning(message, critical) or, when no callback is given, queued in the warnings deque
+# If fingerprints is True every row gets a hash of the raw variable that is used for incremental exports
+# If checkAddresses is True the memory addresses are indexed while parsing and collisions are given as warnings
+# backend is the name of the XML backend ('lxml' or 'stdlib'), by default lxml is used when it is installed
+# The time and item count of the open, parse, walk, metaTags and addresses stages are recorded in stats
+# Every progressStep HMI variables onProgress(variables) is called and, if the cancel event is set, ExportCancelled is raised
+# The cancel event is also checked before every read of the file, so hashing the file for the cache, scanning it for
+# structures and parsing long sections without HMI variables can be cancelled too
+# If a cache (XEFCache.ParseCache) is given the variables of an unchanged file are read from the cache instead of the file
+# If expandStructures is True the HMI variables of a structured type (DDT or array) that are located in %MW memory are
+# exported as one row per elementary field, the DDTs are found with a section index and only parsed when first used
+# Structures are only expanded when source is a path, the variables of a file object are exported as they are
+class XefParser:
+
+    # Initialize class
+    def __init__(self, source, alarmGroup = '', scanGroup = '', logStatus = 2, groupLog = '', onWarning = None,
+                 fingerprints = False, checkAddresses = False, backend = None, cancel = None, onProgress = None,
+                 progressStep = 1000, cache = None, expandStructures = True):
+
+        self.source = source
+        self.alarmGroup = alarmGroup
+        self.scanGroup = scanGroup
+        self.logStatus = logStatus
+        self.groupLog = groupLog
+        self.onWarning = onWarning
+        self.fingerprints = fingerprints
+        self.backend = getBackend(backend)
+        self.cancel = cancel
+        self.onProgress = onProgress
+        self.progressStep = progressStep
+        self.cache = cache
+        self.expandStructures = expandStructures
+
+        # Section index and type layouts of the file, only created when the first structured variable is found
+        self.sectionIndex = None
+        self.layouts = None
+        self.structureSeconds = 0.0
+        self.fieldCount = 0
+
+        # Packs the logged variables into Logging Groups of at most 100 variables
+        self.logGroups = LogGroupPacker(groupLog)
+
+        # Index of the memory addresses of the exported variables
+        self.addresses = AddressIndex() if checkAddresses else None
+
+        # Warnings that have not been read yet, only used when there is no onWarning callback
+        self.warnings = deque()
+
+        # Attributes of the contentHeader element and the project name, filled in while parsing
+        self.header = {}
+        self.projectName = ''
+
+        # Name of the XEF file that is parsed
+        self.xefName = None
+
+        # Number of tags connected to a Logging Group and number of warnings given
+        self.logCount = 0
+        self.warningCount = 0
+
+        # Time spent in every stage of the parsing
+        self.stats = ExportStats()
+        self.metaTagSeconds = 0.0
+        self.metaTagCount = 0
+
+    # Raises ExportCancelled if the user cancelled the export
+    def checkCancel(self):
+
+        if self.cancel is not None and self.cancel.is_set():
+            raise ExportCancelled("Export cancelled.")
+
+    # Opens the XEF file, every read of it checks for a cancel if the export can be cancelled
+    # Returns the file object that has to be closed and the file object to read from
+    def openReader(self):
+
+        xefFile, self.xefName = openXef(self.source)
+        return xefFile, xefFile if self.cancel is None else CancellableReader(xefFile, self.checkCancel)
+
+    # Gives a warning
+    def warn(self, message, critical = False):
+
+        self.warningCount += 1
+
+        if self.onWarning is not None:
+            self.onWarning(message, critical)
+        else:
+            self.warnings.append((message, critical))
+
+    # Streams the file and lazily yields the row of every HMI variable that has a memory address
+    # Raises ET.ParseError, OSError or zipfile.BadZipFile if the file cannot be opened or parsed
+    def rows(self):
+
+        perf = time.perf_counter
+        xefFile = None
+        cacheWriter = None
+        records = None
+
+        # Parses the file itself when its cache file turns out to be damaged while it is read
+        def parseAgain():
+
+            nonlocal xefFile
+            self.warn("Note: the cache file of " + str(self.xefName) + " is damaged, the file was parsed again.")
+            xefFile, reader = self.openReader()
+            return self.backend.iterVariables(reader, {})
+
+        # Look for the variables of the file in the cache, only files given by their path can be cached
+        if self.cache is not None and not hasattr(self.source, 'read'):
+            startTime = perf()
+            cacheKey = self.cache.key(self.source, self.checkCancel)
+            cached = self.cache.load(cacheKey, parseAgain)
+            self.stats.add('cache', perf() - startTime, 0 if cached is None else 1)
+
+            if cached is not None:
+                info, records = cached
+                self.header.update(info['header'])
+                self.xefName = info['xefName']
+
+        if records is None:
+            startTime = perf()
+
+            # Open the XEF file, a ZEF file is read in place without extracting it
+            xefFile, reader = self.openReader()
+            records = self.backend.iterVariables(reader, self.header)
+            self.stats.add('open', perf() - startTime)
+
+            # Save the variables to the cache while the file is parsed
+            if self.cache is not None and not hasattr(self.source, 'read'):
+                cacheWriter = self.cache.writer(cacheKey, {'xefName': self.xefName, 'header': self.header})
+
+        # Time spent reading the file and building the rows, the time the caller spends on a yielded row is not counted
+        parseSeconds = 0.0
+        walkSeconds = 0.0
+        variables = 0
+        exported = 0
+        metaTagSeconds = self.metaTagSeconds
+        structureSeconds = self.structureSeconds
+
+        try:
+            # Loop through all the HMI variables in the dataBlock
+            lastTime = perf()
+            for record in records:
+                readTime = perf()
+                parseSeconds += readTime - lastTime
+                variables += 1
+
+                # Report the progress and stop if the user cancelled the export
+                if variables % self.progressStep == 0:
+                    if self.cancel is not None and self.cancel.is_set():
+                        raise ExportCancelled("Export cancelled after " + str(variables) + " variables.")
+                    if self.onProgress is not None:
+                        self.onProgress(variables)
+
+                # Find the project name (the contentHeader always comes before the dataBlock)
+                self.projectName = self.header.get('name', '')[-4:]
+
+                if cacheWriter is not None:
+                    cacheWriter.add(record)
+
+                # Structured variables give a row for every elementary field
+                if self.expandStructures and record[1] is not None and not isElementary(record[1]):
+                    builtRows = [self.buildRow(*field) for field in self.expandRecord(*record)]
+                else:
+                    builtRows = (self.buildRow(*record),)
+
+                lastTime = perf()
+                walkSeconds += lastTime - readTime
+
+                for rowList in builtRows:
+                    if rowList is not None:
+                        exported += 1
+                        yield rowList
+                        lastTime = perf()
+
+            # Rest of the file after the last variable
+            parseSeconds += perf() - lastTime
+
+            # The file was parsed to the end so its variables can be used by the next export
+            if cacheWriter is not None:
+                startTime = perf()
+                cacheWriter.commit()
+                cacheWriter = None
+                self.stats.add('cache', perf() - startTime, 0)
+
+        finally:
+            # Remove the incomplete cache file
+            if cacheWriter is not None:
+                cacheWriter.abort()
+
+            # Only close the file if it was opened here
+            if xefFile is not None and xefFile is not self.source:
+                xefFile.close()
+            if self.sectionIndex is not None:
+                self.sectionIndex.close()
+
+            # The meta tags and the structures are handled inside the walk so their time is taken out of it
+            metaTagSeconds = self.metaTagSeconds - metaTagSeconds
+            structureSeconds = self.structureSeconds - structureSeconds
+            self.stats.add('parse', parseSeconds, variables)
+            self.stats.add('walk', walkSeconds - metaTagSeconds - structureSeconds, exported)
+            self.stats.add('metaTags', metaTagSeconds, self.metaTagCount)
+            if self.layouts is not None:
+                self.stats.add('structures', structureSeconds, self.fieldCount)
+
+        # Find the project name
+        self.projectName = self.header.get('name', '')[-4:]
+
+        # Give a warning for every variable that shares its memory with another variable
+        if self.addresses is not None:
+            startTime = perf()
+            collisions = self.addresses.collisions()
+            for kind, interval, other in collisions:
+                if kind == 'duplicate':
+                    self.warn("Warning: " + interval[2] + " has the same address " + interval[3] + " as " + other[2] + ".")
+                else:
+                    self.warn("Warning: " + interval[2] + " [" + interval[3] + "] overlaps " + other[2] + " [" + other[3] + "].")
+            self.stats.add('addresses', perf() - startTime, len(collisions))
+
+        # Vijeo will not build a Logging Group with more than 100 variables, so tell the user when the variables were split
+        groups = self.logGroups.groups()
+        if len(groups) > 1:
+            self.warn("Note: " + str(self.logCount) + " logged variables were split into " + str(len(groups)) + " Logging Groups [" + groups[0].name + " to " + groups[-1].name + "] by logging period and database.")
+
+    # Returns the (name, typeName, address, comment, customerString) records of the elementary fields of a structured variable
+    # The comment of the variable is put in front of the comment of every field and the meta tags come from the CustomerString
+    # of the field in the DDT, variables that are not located in %MW memory, variables whose type is not an array or
+    # a DDT or FB of the file and all variables of a source that is a file object are returned unchanged
+    # Raises ET.ParseError if the section of the type is not valid XML
+    def expandRecord(self, variableName, typeName, address, comment = None, customerString = None):
+
+        match = structureAddressPattern.match(address or '')
+        if match is None:
+            return [(variableName, typeName, address, comment, customerString)]
+
+        startTime = time.perf_counter()
+
+        # The sections of the file are only indexed once the first structured variable is found
+        if self.layouts is None:
+            # The sections can only be read again from a path, so a file object is exported as with expandStructures False
+            if hasattr(self.source, 'read'):
+                return [(variableName, typeName, address, comment, customerString)]
+            self.sectionIndex = SectionIndex(lambda: self.openReader()[1])
+            self.layouts = TypeLayouts(self.sectionIndex)
+
+        # Types that are neither elementary nor defined in the file are exported as they are
+        if not self.layouts.isStructured(typeName):
+            self.structureSeconds += time.perf_counter() - startTime
+            return [(variableName, typeName, address, comment, customerString)]
+
+        layout = self.layouts.layout(typeName)
+        if layout is None:
+            self.structureSeconds += time.perf_counter() - startTime
+            self.warn("Warning: could not import " + self.projectName + '.' + variableName + ". The structure of its type " + typeName + " could not be resolved.")
+            return []
+
+        baseWord = int(match.group(1))
+        records = []
+        for field in layout.fields:
+
+            records.append((variableName + fieldSeparator + field.path, field.typeName,
+                            fieldAddress(baseWord, field.offset, field.typeName), joinComments(comment, field.comment),
+                            field.customerString))
+
+        self.fieldCount += len(records)
+        self.structureSeconds += time.perf_counter() - startTime
+
+        return records
+
+    # Creates the compact Vijeo row of a single variable from its name, type, address, comment and CustomerString
+    # Returns None if the variable cannot be imported
+    def buildRow(self, variableName, typeName, address, comment = None, customerString = None):
+
+        # Variable name apppended with the project name
+        name = self.projectName + '.' + variableName
+
+        # Check if the address is NoneType or is not a memory address
+        if address is None or address[:2] != '%M':
+            # Give a warning
+            self.warn("Warning: could not import " + name + ". No memory address found.")
+            # Do not import the current variable
+            return None
+
+        # Add the address to the address index
+        if self.addresses is not None and not self.addresses.add(name, address):
+            self.warn("Warning: could not decode the address " + address + " of " + name + ".")
+
+        row = VijeoRow(name, typeName, address, self.scanGroup)
+
+        # Check if the type is EBOOL
+        if row.dataType == "EBOOL":
+            # Change it to BOOL because Vijeo only lets you import BOOL and not EBOOL
+            row.dataType = "BOOL"
+
+        # Add the comment of the variable
+        if comment is not None:
+            row.description = comment
+
+        # Meta tags of the variable, empty if the variable has no CustomerString
+        metaTags = noMetaTags
+
+        # If meta tags exist
+        if customerString is not None:
+            # Put all the meta tags into the metaTags record
+            startTime = time.perf_counter()
+            metaTags = parseMetaTags(customerString)
+            self.metaTagSeconds += time.perf_counter() - startTime
+            self.metaTagCount += 1
+
+        # Hash the name, address, type, comment and meta tags of the variable
+        if self.fingerprints:
+            row.fingerprint = fingerprint(name, address, typeName, row.description, customerString)
+
+        # Add severity of each type of event
+        # 20 for trip, 10 for alarm and 1 for event
+        if metaTags.trip:
+            row.severity = 20
+
+        elif metaTags.alarm:
+            row.severity = 10
+
+        elif metaTags.event:
+            row.severity = 1
+
+        # Add the user given Alarm Group name to the alarm, event or trip variables
+        if row.severity is not None:
+            row.alarmGroup = self.alarmGroup
+
+        # Check if log status meta tag exists and the Logging Group is enabled by the user
+        if metaTags.log and self.logStatus == 1:
+            # Add the Group Logging of the variable's logging period and database to the row
+            row.logGroup = self.logGroups.assign(metaTags.logPer, metaTags.logDb)
+            # Increment the Group Logging variables count
+            self.logCount += 1
+
+        # Add the range of the variable
+        row.minEu = metaTags.minEu
+        row.maxEu = metaTags.maxEu
+        row.metaTags = metaTags
+        if customerString is not None:
+            row.customerString = customerString
+
+        return row
+
+# Fingerprints of the variables of a project from its last export
+# Used to find the variables that were added, changed or removed since then with dictionary lookups
+class FingerprintStore:
+
+    # Initialize class
+    def __init__(self, path):
+
+        self.path = path
+
+        # Fingerprints from the last export, empty if the project has not been exported before
+        try:
+            with open(path, 'r') as storeFile:
+                self.previous = json.load(storeFile)
+        except FileNotFoundError:
+            self.previous = {}
+
+        # Fingerprints of the current export
+        self.current = {}
+
+        # Number of added and changed variables
+        self.added = 0
+        self.changed = 0
+
+    # Records the fingerprint of a row and returns 'added', 'changed' or None if the variable did not change
+    def update(self, row):
+
+        self.current[row.name] = row.fingerprint
+        oldFingerprint = self.previous.get(row.name)
+
+        if oldFingerprint is None:
+            self.added += 1
+            return 'added'
+
+        if oldFingerprint != row.fingerprint:
+            self.changed += 1
+            return 'changed'
+
+        return None
+
+    # Returns the names of the variables of the last export that are not in the current export
+    def removed(self):
+        return [name for name in self.previous if name not in self.current]
+
+    # Saves the fingerprints of the current export for the next one
+    def save(self):
+
+        # Write to a temporary file first so an interrupted save never corrupts the store
+        with open(self.path + '.tmp', 'w') as storeFile:
+            json.dump(self.current, storeFile)
+        os.replace(self.path + '.tmp', self.path)
+
+# Passes the rows through and writes the rows that were added or changed since the last export to the delta csv
+def trackChanges(rows, store, writer):
+
+    for row in rows:
+        if store.update(row) is not None:
+            writer.writerow(row)
+        yield row
+
+# Does all the processing on the XEF or ZEF file
+# Saves the rows of all the HMI variables to a csv in the given directory path
+# Warnings are passed to warn(message, critical) and a summary of the export is returned
+# If checkAddresses is True the memory addresses of all the exported variables are indexed and a warning is given for
+# every variable that shares its memory with another one, the index holds every variable so it is off by default
+# If scanPlan is 'report' the exported variables are packed into blocks of neighbouring memory and the block plan is
+# saved to a csv, if it is 'assign' every variable also gets the scan group of its block (scanGroup_1, scanGroup_2, ...)
+# The scan plan is made from the same index so the addresses are always checked when a scan plan is asked for
+# maxRequest is the largest request in words and maxGap the largest number of unused words bridged inside a block
+# If incremental is True a delta csv with only the added and changed variables and a csv with the removed variables
+# are also saved, compared to the fingerprints stored by the last incremental export of the same file name
+# backend picks the XML backend ('lxml' or 'stdlib'), both give the same csv
+# The time and item count of every stage are added to the summary and, if saveStats is True, the summary is also saved
+# to a JSON file next to the csv
+# cancel and onProgress are passed to the parser, a cancelled export raises ExportCancelled and leaves no csv behind
+# If a catalog (XEFCatalog.TagCatalog) is given the exported variables are also loaded into it under the csv file name
+# If a cache (XEFCache.ParseCache) is given an unchanged file is not parsed again
+# formats lists the output formats written in the same pass (names of the writers dictionary), the Vijeo csv by default
+# If expandStructures is True the structured HMI variables are exported field by field
+# Raises ET.ParseError, OSError or zipfile.BadZipFile if the file cannot be opened or parsed and ValueError if a format
+# is unknown
+def exportXEF(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName, warn, outDir = None, incremental = False,
+              scanPlan = None, maxRequest = 125, maxGap = 8, backend = None, saveStats = False, cancel = None,
+              onProgress = None, catalog = None, cache = None, formats = None, expandStructures = True,
+              checkAddresses = False):
+
+    # Check the output formats before the file is parsed
+    formats = ['vijeo'] if formats is None else list(dict.fromkeys(formats))
+    if len(formats) == 0:
+        raise ValueError("No output format given")
+    for name in formats:
+        getWriter(name)
+
+    # Start the export timer
+    perf = time.perf_counter
+    startTime = perf()
+
+    # Stores the directory location, the csv is saved next to the input file by default
+    dirPath = os.path.dirname(filePath) if outDir is None else outDir
+
+    # Generator of the rows of all the HMI variables
+    parser = XefParser(filePath, alarmGroup, scanGroup, logStatus, groupLog, warn, fingerprints = incremental,
+                       checkAddresses = checkAddresses or scanPlan is not None, backend = backend, cancel = cancel, onProgress = onProgress,
+                       cache = cache, expandStructures = expandStructures)
+    rows = parser.rows()
+    stats = parser.stats
+
+    # Read the first row so the file is opened and the project name is known before the csv is created
+    streamTime = perf()
+    firstRow = next(rows, None)
+    if firstRow is not None:
+        rows = chain([firstRow], rows)
+
+    # The scan groups can only be assigned once the addresses of all the variables are known
+    # so the whole file is parsed first and the compact rows are kept in memory
+    if scanPlan == 'assign':
+        rows = list(rows)
+        planTime = perf()
+        blocks = parser.addresses.planBlocks(maxRequest, maxRequest * 16, maxGap)
+
+        # Give every variable the scan group of its block
+        groups = {}
+        for i, block in enumerate(blocks):
+            for name in block.names:
+                groups[name] = scanGroup + '_' + str(i + 1)
+
+        for row in rows:
+            row.scanGroup = groups.get(row.name, row.scanGroup)
+
+        stats.add('scanPlan', perf() - planTime, len(blocks))
+
+    # If the user did not enter a file name, use the file name of the input file for the csv
+    if len(fileName) == 0:
+        fileName = Path(parser.xefName).stem
+
+    # Paths of all the files saved by the export
+    outputPaths = {name: os.path.join(dirPath, fileName + getWriter(name).suffix) for name in formats}
+    deltaPath = os.path.join(dirPath, fileName + "_Vijeo_Delta.csv")
+    removedPath = os.path.join(dirPath, fileName + "_Vijeo_Removed.csv")
+    deltaFile = None
+    catalogRows = None
+    outputs = []
+
+    # Stream the rows to the output files in the given directory
+    try:
+        # Load the rows into the tag catalog while they are written
+        if catalog is not None:
+            rows = catalogRows = catalog.track(rows, fileName, parser.header.get('name', ''), filePath)
+
+        # Write the added and changed rows to the delta csv while the full csv is written
+        if incremental:
+            store = FingerprintStore(os.path.join(dirPath, fileName + "_Vijeo_Fingerprints.json"))
+            deltaFile, deltaWriter = openVijeoCSV(parser.projectName, deltaPath)
+            rows = trackChanges(rows, store, deltaWriter)
+
+        # Open every output writer and write all of them in the same pass
+        for name in formats:
+            outputs.append(getWriter(name)(parser.projectName, outputPaths[name]))
+        exported = writeRows(rows, outputs)
+
+        for output in outputs:
+            output.close()
+
+    except:
+        # Remove the partial catalog load straight away
+        if catalogRows is not None:
+            catalogRows.close()
+
+        # Do not leave half written csv files behind if the file could not be parsed to the end
+        if deltaFile is not None:
+            deltaFile.close()
+            os.remove(deltaPath)
+        for output in outputs:
+            output.abort()
+        raise
+
+    # All the time of the stream that was not spent in the parser was spent writing the output files
+    stats.add('write', max(perf() - streamTime - stats.total(), 0.0), exported)
+
+    # Summary of the export, output is the file of the first format
+    summary = {'input': str(filePath), 'project': parser.projectName, 'output': outputPaths[formats[0]],
+               'outputs': outputPaths, 'exported': exported, 'backend': parser.backend.name,
+               'logCount': parser.logCount, 'logGroups': [group._asdict() for group in parser.logGroups.groups()],
+               'warnings': parser.warningCount}
+
+    # Save the scan block plan, in the report mode the blocks are planned now that the whole file has been streamed
+    if scanPlan is not None:
+
+        planTime = perf()
+        if scanPlan == 'report':
+            blocks = parser.addresses.planBlocks(maxRequest, maxRequest * 16, maxGap)
+
+        planPath = os.path.join(dirPath, fileName + "_Vijeo_Scan_Plan.csv")
+        with open(planPath, 'w', newline="") as planFile:
+            writer = csv.writer(planFile)
+            writer.writerow(["Scan Group", "Start Address", "End Address", "Length", "Variables"])
+
+            for i, block in enumerate(blocks):
+                writer.writerow([scanGroup + '_' + str(i + 1), '%' + block.area + str(block.start),
+                                 '%' + block.area + str(block.end - 1), block.end - block.start, len(block.names)])
+
+        stats.add('scanPlan', perf() - planTime, 0 if scanPlan == 'assign' else len(blocks))
+        summary.update({'scanPlan': planPath, 'scanBlocks': len(blocks)})
+
+    if incremental:
+        saveTime = perf()
+        deltaFile.close()
+
+        # Save the names of the removed variables
+        removed = store.removed()
+        with open(removedPath, 'w', newline="") as removedFile:
+            writer = csv.writer(removedFile)
+            writer.writerow(["Name"])
+            writer.writerows([name] for name in removed)
+
+        # Keep the fingerprints of this export for the next one
+        store.save()
+        stats.add('fingerprints', perf() - saveTime, len(store.current))
+
+        summary.update({'delta': deltaPath, 'added': store.added, 'changed': store.changed, 'removed': len(removed)})
+
+    summary['variables'] = stats.stages['parse'][1]
+    summary['stages'] = stats.toDict()
+    summary['seconds'] = round(perf() - startTime, 3)
+
+    # Save the summary next to the csv so slow exports can be compared
+    if saveStats:
+        summary['stats'] = os.path.join(dirPath, fileName + "_Vijeo_Export_Stats.json")
+        with open(summary['stats'], 'w') as statsFile:
+            json.dump(summary, statsFile, indent = 2)
+
+    # Return the summary of the export
+    return summary
@@ -4,189 +4,28 @@
 
 # Importing libraries (make sure any missing libraries are installed)
 import os
-import csv
-import time
+import queue
 import zipfile
-import shutil
-from pathlib import Path
+import threading
 import xml.etree.ElementTree as ET
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
 from tkinter.messagebox import showerror, showwarning, showinfo
+from XEFHandler import exportXEF, ExportCancelled
+from XEFCache import ParseCache
 
 #-----------------------------------------------------Functions-----------------------------------------------------
 
-# Copies a file/directory without overwriting if a file/directory already exists with the same input name
-def safe_copy(infilePath, outfilePath):
+# Runs the export of the XEF or ZEF file on a worker thread so the window does not freeze
+# The warnings, the progress and the result are sent back through the messages queue and shown by drainMessages
+def parseXEF(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName, saveStats, checkAddresses):
 
-    # Directory path for the copied file
-    outDir = Path(outfilePath).parent
-
-    # Check if the file already exists
-    if not Path(outfilePath).is_file():
-        
-        # Copy the file
-        shutil.copy(infilePath, outfilePath)
-        # Return destination file path
-        return outfilePath
-    
-    # If file exists
-    else:
-        
-        # Split file name and extension into two variables
-        base, extension = os.path.splitext(os.path.basename(outfilePath))
-        i = 1
-        # Loop until file name does not already exist in the destination directory
-        while os.path.exists(os.path.join(outDir, '{}_{}{}'.format(base, i, extension))):
-            i += 1
-        # Copy the file
-        shutil.copy(infilePath, os.path.join(outDir, '{}_{}{}'.format(base, i, extension)))
-        # Return destination file path
-        return os.path.join(outDir, '{}_{}{}'.format(base, i, extension))
-
-# Takes a 2D list and saves the contents of the list to a csv file
-def savetoCSV(projectName, listItems, filename):
-
-    # Define all the fields/columns for the csv
-    fields = ["Type", "Name","Data Type", "Data Source",
-              "Dimension", "Description", "Initial Value",
-              "NumofBytes", "Data Sharing", "Alarm", "English ID",
-              "Alarm Message", "Alarm Type", "Trigger Condition",
-              "Deadband", "Target", "LoLo\\Lo\\Hi\\HiHi", "Minor",
-              "Major", "Alarm Group", "Severity", "Vibration Pattern",
-              "Vibration Time","Sound File","Play Mode","Scan Group",
-              "Device Address", "Bit Number", "Data Format", "Signed",
-              "Data Length", "Offset Bit No", "Bit Width", "InputRange",
-              "Min", "Max", "DataScaling", "RawMin", "RawMax", "ScaledMin",
-              "ScaledMax", "IndirectEnabled", "IndirectAddress","Retentive",
-              "LoggingGroup", "LogUserOperationsOnVariable"]
-    
-    # Create a new csv file
-    with open(filename, 'w', newline="") as csvfile:
-  
-        # creating a csv dict writer object
-        writer = csv.writer(csvfile)
-        
-        # writing headers
-        writer.writerow(["'5.1.0", "Vijeo-Designer 6.2.11 CSV output"])
-        writer.writerow(fields)
-        writer.writerow(["Folder", projectName] + [''] * 44)
-  
-        # writing data rows
-        writer.writerows(listItems)
-
-# Takes in string and substring parameters and returns the substring if it exists within the string
-def extractWord(s, subStr):
-
-    # Locate the position of the space character starting from the position of the first letter of the substring
-    findDelimiter = s.find(' ', s.find(subStr))
-
-    # If the space character is found
-    if findDelimiter != -1:
-        
-        # Return the characters between starting position of substring and the position of the space character
-        return s[s.find(subStr) : findDelimiter]
-    
-    # If space character is not found but the substring is found
-    elif s.find(subStr) != -1:
-        
-        # Substring is the last word in the string so return the last word
-        return s[s.find(subStr) : ]
-    else:
-        return ''
-
-# Takes in a string, extracts tags from it and puts the results in a list
-def parseMetaTags(metaTag):
-
-    # Total number of tags possible = 18
-    # Create an empty list of length 18
-    tagList = [''] * 18
-
-    # Extract all the tags from the string
-    # If a tag does not exist, return an empty string 
-    tagList[0] = extractWord(metaTag, '-a ')
-    tagList[1] = extractWord(metaTag, '-t ')
-    tagList[2] = extractWord(metaTag, '-i ')
-    tagList[3] = extractWord(metaTag, '-e ')
-    tagList[4] = extractWord(metaTag, '-log')
-    tagList[5] = extractWord(metaTag, '-nc')
-    tagList[6] = extractWord(metaTag, '-s ')
-    tagList[7] = extractWord(metaTag, '-eu=')
-    tagList[8] = extractWord(metaTag, '-mineu=')
-    tagList[9] = extractWord(metaTag, '-maxeu=')
-    tagList[10] = extractWord(metaTag, '-minraw=')
-    tagList[11] = extractWord(metaTag, '-maxraw=')
-    tagList[12] = extractWord(metaTag, '-logdb=')
-    tagList[13] = extractWord(metaTag, '-logper=')
-    tagList[14] = extractWord(metaTag, '-onmsg=')
-    tagList[15] = extractWord(metaTag, '-offmsg=')
-    tagList[16] = extractWord(metaTag, '-area=')
-    tagList[17] = extractWord(metaTag, '-f=')
-
-    # Return the filled list
-    return tagList
-
-# Extracts the XEF file from a given ZEF file and returns its path
-def extractXefFromZef(filePath):
-
-    p = Path(filePath)
-    # Copy the file and convert it to .zip extension by calling safe_copy function and return the path of the copied file to filePath
-    filePath = safe_copy(p, p.with_suffix('.zip'))
-    
-    # Unzip the .zip file just created
-    unzipDir = os.path.join(os.path.dirname(filePath), Path(filePath).stem)
-    with zipfile.ZipFile(filePath, 'r') as zip_ref:
-        zip_ref.extractall(unzipDir)
-        
-    # Delete the .zip file
-    os.remove(filePath)
-    
-    # Return a list containing the paths of all the XEF files in the given directory
-    return list(Path(unzipDir).glob('*.xef'))
-
-# Does all the processing on the XEFor ZEF file
-# Creates a 2D list with all the information required and saves it to a csv in the given directory path
-def parseXEF(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName):
-
-    # Flag to keep track of whether an unzipped directory needs to be deleted later
-    deleteLater = False
-    # Stores the directory location
-    dirPath = os.path.dirname(filePath)
-
-    # Check if the file has a .zef extension
-    if Path(filePath).suffix == '.zef':
-
-        # Get the XEF file from the ZEF file and change the filePath to the newly created XEF file
-        filePath = extractXefFromZef(filePath)[0]
-        # The unzipped folder will have to be deleted later
-        deleteLater = True
-
-    # Check if the file can be opened
-    try:
-        ET.parse(filePath)
-    except:
-        debugger.insert(tk.END, "Error: file selected does not have a '.zef' or '.xef' extension.")
-        debugger.itemconfig(tk.END, foreground="red")
-        showerror(title='File Open Error', message="Cannot open the file specified.")
-        return
-    else:
-        # Put the contents of the XEF file into tree (converts to XML)
-        tree = ET.parse(filePath)
+    global debuggerIndex
 
     # Empty the log window
     debugger.delete(0, tk.END)
-    
-    # Get the root element of the XML file
-    root = tree.getroot()
-    # Create an empty 2D list to store HMI Tags and their attributes
-    itemList = []
-
-    # Find the project name
-    projectName = root.find("contentHeader").attrib.get('name')[-4:]
 
-    # Variable that counts the number of tags connected to a Logging Group
-    logCount = 0
     # Variable that keeps a track of the number of warnings
     debuggerIndex = 1
 
@@ -195,165 +34,138 @@ def parseXEF(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName):
     debugger.insert(tk.END, "-----------------------------------------")
     debugger.insert(tk.END, '')
 
-    # Find all the HMI elements and get the parent element with the child element named attribute of the HMI attribute
-    variableLocation = root.iterfind("./dataBlock/variables/attribute[@name='IsVariableHMI']/..[attribute]")
-    
-    # Loop through all the HMI variables in the dataBlock
-    for descendant in variableLocation:
-
-        # List that stores all the information for the current variable in the iteration
-        # Total number of columns in the final csv must be 46
-        rowList = [''] * 46
-        # Initialize an empty list of length 18 (max number of meta tags possible) to store all the meta tags
-        metaTagsList = [''] * 18
-
-        # Add the variable name apppended with the project name to the rowList
-        rowList[1] = projectName + '.' + descendant.attrib.get('name')
-
-        # Add the address to the rowList
-        rowList[26] = descendant.attrib.get('topologicalAddress')
-
-        # Check if the address is NoneType or is not a memory address
-        if rowList[26] is None or rowList[26][:2] != '%M':
-            # Give a warning in the debugger
-            debugger.insert(tk.END, str(debuggerIndex) +'. ' + "Warning: could not import " + rowList[1] + ". No memory address found." )
-            # Move debugger to the next line
+    # Only one export can run at a time and it can be cancelled until it is done
+    cancelEvent.clear()
+    create_button.state(['disabled'])
+    cancel_button.state(['!disabled'])
+    progress.set("Reading...")
+
+    # Start the export and check for its messages
+    worker = threading.Thread(target=exportWorker, args=(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName, saveStats, checkAddresses), daemon=True)
+    worker.start()
+    root.after(50, drainMessages)
+
+# Runs on the worker thread, does the export and puts the warnings, the progress and the result in the messages queue
+# Tk widgets must not be touched from here
+def exportWorker(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName, saveStats, checkAddresses):
+
+    # Sends a warning to the log window
+    def warn(message, critical = False):
+        messages.put(('warning', message, critical))
+
+    # Sends the number of variables read so far to the log window
+    def onProgress(variables):
+        messages.put(('progress', variables))
+
+    # Check if the file can be opened and parsed
+    try:
+        # Files that were exported before are read from the cache in the user's local application data
+        cache = ParseCache(os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), 'XEF Parser', 'Cache'))
+        summary = exportXEF(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName, warn, saveStats = saveStats,
+                            cancel = cancelEvent, onProgress = onProgress, cache = cache, checkAddresses = checkAddresses)
+    except ExportCancelled:
+        messages.put(('cancelled',))
+    except (ET.ParseError, OSError, zipfile.BadZipFile):
+        messages.put(('error', None))
+    except Exception as e:
+        messages.put(('error', e))
+    else:
+        messages.put(('done', summary))
+
+# Shows the queued messages of the export in the log window, runs on the Tk main thread with an after() timer
+# The warnings are inserted in batches since inserting them one at a time is very slow with thousands of warnings
+def drainMessages():
+
+    global debuggerIndex
+
+    # Warnings of this batch, the positions of the critical ones and the result of the export if it is done
+    lines = []
+    critical = []
+    result = None
+
+    # Take at most 2000 messages per call so the window stays responsive
+    for i in range(2000):
+        try:
+            message = messages.get_nowait()
+        except queue.Empty:
+            break
+
+        if message[0] == 'warning':
+            if message[2]:
+                critical.append(len(lines))
+            lines.append(str(debuggerIndex) + '. ' + message[1])
             debuggerIndex += 1
-            # Do not import the current variable
-            continue
-        
-        # Add the variable type to the rowList
-        rowList[2] = descendant.attrib.get('typeName')
-        
-        # Check if the type is EBOOL
-        if rowList[2] == "EBOOL":
-            # Change it to BOOL because Vijeo only lets you import BOOL and not EBOOL
-            rowList[2] = "BOOL"
-
-        # Find the comment attribute of the variable
-        temp = descendant.find("comment")
-        if temp is not None:
-            # Add it to the rowList
-            rowList[5] = descendant.find("comment").text
-
-        # Find the meta tags of the variable
-        temp = descendant.find("./attribute/[@name='CustomerString']")
-        # If meta tags exist
-        if temp is not None:
-            # Put all the meta tags into the metaTagsList list
-            metaTagsList = parseMetaTags(descendant.find("./attribute/[@name='CustomerString']").attrib.get('value'))
-
-        # Check if the variable is an alarm, event or trip
-        if metaTagsList[0] == '-a' or metaTagsList[1] == '-t' or metaTagsList[3] == '-e':
-
-            # Fixed values for the alarm, event or trip variables
-            rowList[9] = "Enable"
-            # Copy the description to the alarm message
-            rowList[11] = rowList[5]
-            rowList[13] = "when high"
-            rowList[16] = "_\\_\\_\\_"
-            # Add the user given Scan Group and Logging Group names
-            rowList[19] = alarmGroup
-            rowList[25] = scanGroup
-
-            # Add severity of each type of event
-            # 20 for trip, 10 for alarm and 1 for event
-            if '-t' in metaTagsList:
-                rowList[20] = 20
-                
-            elif '-a' in metaTagsList:
-                rowList[20] = 10
-                
-            elif '-e' in metaTagsList:
-                rowList[20] = 1
-                
-            else:
-                rowList[20] = ''
+
+        elif message[0] == 'progress':
+            progress.set(str(message[1]) + " variables read...")
 
         else:
-            # Add no default values or severity
-            # Disable the alarm
-            rowList[9] = "Disable"
-
-        # Check if log status meta tag exists and the Logging Group is enabled by the user
-        if metaTagsList[4] == '-log' and logStatus == 1:
-            # Add the Group Logging to the rowList
-            rowList[44] = groupLog
-            # Increment the Group Logging variables count
-            logCount += 1
-        
-        # Fixed Values of columns 1, 4, 5, 11, 26, 35, 36 and 42
-        rowList[0] = "Variable"
-        rowList[3] = "External"
-        rowList[4] = 0
-        rowList[10] = 1
-        rowList[25] = scanGroup
-        rowList[34] = metaTagsList[8][metaTagsList[8].find("=") + 1 : ]
-        rowList[35] = metaTagsList[9][metaTagsList[9].find("=") + 1 : ]
-        rowList[41] = "Disable"
-
-        # If variable type is not BOOL
-        if rowList[2] != 'BOOL':
-
-            # If it is UDINT, set data length to 32 bits
-            if rowList[2] == 'UDINT':
-                rowList[30] = "32Bits"
-                
-            # If it is REAL, leave the column empty    
-            elif rowList[2] == 'REAL':
-                pass
-
-            # If it is INT or UINT, set data length to 16 bits
-            else:
-                rowList[30] = "16Bits"
-
-            # Disable the input range
-            rowList[33] = "Disable"
-
-        # Add the variable to the 2D list
-        itemList.append(rowList)
-    
-    # If the user did not enter a file name, use the file name of the input file for the csv
-    if len(fileName) == 0:
-        fileName = Path(filePath).stem
+            result = message
+            break
+
+    # Add the whole batch of warnings with a single insert
+    if len(lines) > 0:
+        first = debugger.size()
+        debugger.insert(tk.END, *lines)
+        for offset in critical:
+            debugger.itemconfig(first + offset, foreground='red')
+        debugger.see(tk.END)
+
+    # Check again later if the export is still running
+    if result is None:
+        root.after(50, drainMessages)
+        return
 
-    # If the Logging Group variables exceed 100, give a warning since Vijeo will not build the project in that case
-    if(logCount > 100):
-        debugger.insert(tk.END, str(debuggerIndex) + ". Critical warning: variable Logging Group [count: " + str(logCount) + "] has exceeded the maximum number [100] possible in [HMI_TRE].")
-        debugger.itemconfig(tk.END, foreground='red')
-        debuggerIndex += 1
+    # The export is done, allow a new one
+    create_button.state(['!disabled'])
+    cancel_button.state(['disabled'])
+    progress.set('')
 
-    # Save the 2D list to a csv in the same directory as the input file
-    savetoCSV(projectName, itemList, os.path.join(dirPath, fileName + "_Vijeo_Export.csv"))
+    if result[0] == 'done':
+        showSummary(result[1])
 
-    # Delete the spare folder created by unzipping the ZEF file
-    if deleteLater:
-        try:
-            shutil.rmtree(os.path.dirname(filePath))
-        except:
-            pass
+    elif result[0] == 'cancelled':
+        debugger.insert(tk.END, "Export cancelled.")
+        debugger.itemconfig(tk.END, foreground="red")
+        debugger.see(tk.END)
+
+    else:
+        debugger.insert(tk.END, "Error: file selected does not have a '.zef' or '.xef' extension." if result[1] is None else "Error: " + str(result[1]))
+        debugger.itemconfig(tk.END, foreground="red")
+        debugger.see(tk.END)
+        showerror(title='File Open Error', message="Cannot open the file specified.")
+
+# Shows the result of a successful export in the log window
+def showSummary(summary):
 
     # Debugger output at when the program succesfully executes    
     debugger.insert(tk.END, '')
     debugger.insert(tk.END, "Total warnings: " + str(debuggerIndex - 1))
     debugger.insert(tk.END, "Export Succesful.")
-    debugger.insert(tk.END, "File export path: " +  os.path.join(dirPath, fileName + "_Vijeo_Export.csv"))
+    debugger.insert(tk.END, "File export path: " +  summary['output'])
     debugger.itemconfig(debugger.size() - 3, foreground="red")
     debugger.itemconfig(debugger.size() - 2, foreground="green")
     debugger.itemconfig(debugger.size() - 1, foreground="green")
     debugger.itemconfig(0, foreground="black")
     debugger.itemconfig(1, foreground="black")
     debugger.select_set(debugger.size() - 5)
+
+    # Show the time and the number of items of every stage of the export
+    debugger.insert(tk.END, "Export time: " + str(summary['seconds']) + " s [" + str(summary['variables']) + " HMI variables]")
+    for stage in summary['stages']:
+        debugger.insert(tk.END, "    " + stage + ": " + format(summary['stages'][stage]['seconds'], '.3f') + " s [" + str(summary['stages'][stage]['count']) + "]")
+    if 'stats' in summary:
+        debugger.insert(tk.END, "Stats file path: " + summary['stats'])
     debugger.see(tk.END)
 
     # Open the directory where the csv file has been saved
-    os.startfile(dirPath)
+    os.startfile(os.path.dirname(summary['output']))
 
     # Show a success message box 
     showinfo(title='Success!', message="Your file has been created successfully!")
 
 # Handles all the user input errors    
-def errorHandler(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName):
+def errorHandler(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName, saveStats, checkAddresses):
 
     # Input file path error
     if len(filePath) == 0:
@@ -381,7 +193,7 @@ def errorHandler(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName)
 
     # If no errors then run the program
     else:
-        parseXEF(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName)
+        parseXEF(filePath, alarmGroup, scanGroup, logStatus, groupLog, fileName, saveStats, checkAddresses)
 
 # Lets a user choose a file from a browser window    
 def browse_button():
@@ -447,6 +259,14 @@ scanGroup = tk.StringVar()
 groupLog = tk.StringVar()
 ofileName = tk.StringVar()
 selected = tk.IntVar()
+saveStats = tk.BooleanVar()
+checkAddresses = tk.BooleanVar()
+progress = tk.StringVar()
+
+# Messages sent by the export thread to the log window, the cancel event stops the export
+messages = queue.Queue()
+cancelEvent = threading.Event()
+debuggerIndex = 1
 
 ##canvas = tk.Canvas(root, width = 150, height = 20)
 ##canvas.grid(row=0, column=1, sticky=tk.W)
@@ -512,13 +332,30 @@ r2 = ttk.Radiobutton(root, text='Disable', value=2, variable=selected, command=h
 selected.set(2)
 
 # Create button which executes the program
-create_button = ttk.Button(root, text="Create", command=lambda: errorHandler(filePath.get(), alarmGroup.get(), scanGroup.get(), selected.get(), groupLog.get(), ofileName.get()))
+create_button = ttk.Button(root, text="Create", command=lambda: errorHandler(filePath.get(), alarmGroup.get(), scanGroup.get(), selected.get(), groupLog.get(), ofileName.get(), saveStats.get(), checkAddresses.get()))
 create_button.grid(column=1, row=8, sticky=tk.W , pady=5)
 
+# Cancel button which stops a running export, only enabled while the export runs
+cancel_button = ttk.Button(root, text="Cancel", command=cancelEvent.set)
+cancel_button.grid(column=1, row=8, sticky=tk.E , padx=(0,50), pady=5)
+cancel_button.state(['disabled'])
+
+# Check button to also save the export statistics to a JSON file next to the csv
+stats_check = ttk.Checkbutton(root, text="Save stats", variable=saveStats)
+stats_check.grid(column=0, row=8, sticky=tk.W, padx=40, pady=5)
+
+# Check button to warn about variables that share their memory with another variable
+addresses_check = ttk.Checkbutton(root, text="Check addresses", variable=checkAddresses)
+addresses_check.grid(column=0, row=10, sticky=tk.W, padx=40, pady=(0,10))
+
 # Label for the log list
 debugger_label = ttk.Label(root, text="Status Log:")
 debugger_label.grid(column=0, row=9, sticky=tk.NW, padx = 40)
 
+# Label that shows the progress of a running export
+progress_label = ttk.Label(root, textvariable=progress, foreground='grey')
+progress_label.grid(column=1, row=9, sticky=tk.NW)
+
 # Log list
 debugger = tk.Listbox(root, height=6, width = 42, fg='orange')
 debugger.grid(column=0, columnspan=4, row=9, sticky=tk.SW, padx=(40, 0), ipadx = 30, pady=(10,15))
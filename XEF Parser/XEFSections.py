@@ -0,0 +1,342 @@
+# Author: M. Adil Zafar Khan
+# Date: 26th October 2021
+# Description: Lazy section index of XEF files and memory layouts of structured types. A quick scan finds where the top
+# level sections (contentHeader, DDT sources, FB sources, dataBlock) start and end without building any elements, so a
+# single DDT can be parsed when a variable of that type is found. The layout of every type is resolved once per project
+# and used to expand structured HMI variables into their elementary fields.
+
+# Importing libraries (make sure any missing libraries are installed)
+import re
+from collections import namedtuple
+from xml.parsers import expat
+import xml.etree.ElementTree as ET
+
+#-----------------------------------------------------Functions-----------------------------------------------------
+
+# Size in bytes of the elementary types of the M340 and M580
+# BOOL and EBOOL fields of a structure take a whole byte
+typeSizes = {'BOOL': 1, 'EBOOL': 1, 'BYTE': 1, 'SINT': 1, 'USINT': 1, 'INT': 2, 'UINT': 2, 'WORD': 2, 'DINT': 4,
+             'UDINT': 4, 'DWORD': 4, 'REAL': 4, 'TIME': 4, 'DATE': 4, 'TOD': 4, 'TIME_OF_DAY': 4, 'DT': 8,
+             'DATE_AND_TIME': 8, 'LINT': 8, 'ULINT': 8, 'LWORD': 8, 'LREAL': 8}
+
+# Memory area of the address of the elementary fields that can be exported, by type
+typeAreas = {'BOOL': 'MW.X', 'EBOOL': 'MW.X', 'INT': 'MW', 'UINT': 'MW', 'WORD': 'MW', 'DINT': 'MD', 'UDINT': 'MD',
+             'DWORD': 'MD', 'TIME': 'MD', 'REAL': 'MF'}
+
+stringPattern = re.compile(r'STRING(?:\[(\d+)\])?$', re.IGNORECASE)
+arrayPattern = re.compile(r'ARRAY\s*\[(.+?)\]\s*OF\s+(.+)$', re.IGNORECASE)
+rangePattern = re.compile(r'\s*(-?\d+)\s*\.\.\s*(-?\d+)\s*$')
+
+# Sections of an FB source that hold the fields of its instances, in the order Unity declares them
+# The private variables are not given, they can only be read inside the function block
+fbFieldSections = ('inputParameters', 'outputParameters', 'inOutParameters', 'publicLocalVariables')
+
+# Names of the fields of an expanded variable are joined with this separator, Vijeo uses '.' for folders
+fieldSeparator = '_'
+
+# Elementary field of a type, path is the name of the field inside the type ('' for an elementary type itself) and
+# offset is its position in bytes from the start of the type
+Field = namedtuple('Field', ['path', 'typeName', 'offset', 'comment', 'customerString'])
+
+# Memory layout of a type, size is in bytes
+TypeLayout = namedtuple('TypeLayout', ['size', 'fields'])
+
+# Joins the comment of a variable or field with the comment of a field inside it, either can be None
+def joinComments(outer, inner):
+
+    if not inner:
+        return outer
+    if not outer:
+        return inner
+
+    return outer + ' - ' + inner
+
+# Returns True if the type is not a structure or an array
+def isElementary(typeName):
+    return typeName in typeSizes or stringPattern.match(typeName) is not None
+
+# Returns the address of a field at a byte offset from a variable located at the word address baseWord
+# Returns None for fields that Vijeo cannot address (BYTE, STRING, DT)
+def fieldAddress(baseWord, offset, typeName):
+
+    area = typeAreas.get(typeName)
+    if area is None:
+        return None
+
+    word = baseWord + offset // 2
+
+    # A BOOL field uses one byte, bit 0 or 8 of its word
+    if area == 'MW.X':
+        return '%MW' + str(word) + '.' + str(offset % 2 * 8)
+
+    return '%' + area + str(word)
+
+# Index of the top level sections of an XEF file
+# The file is scanned with expat, which only reports the start and end of the elements, and the scan stops as soon as the
+# section that was asked for is found, so the sections near the start of the file are found without reading the rest
+# opener() returns a new binary file object of the XEF, one is used for the scan and another one to read the sections
+class SectionIndex:
+
+    # Sections that are indexed and the attribute that holds their name
+    sectionNames = {'contentHeader': None, 'DDTSource': 'DDTName', 'FBSource': 'nameOfFBType', 'dataBlock': None}
+
+    # Initialize class
+    def __init__(self, opener, chunkSize = 1048576):
+
+        self.opener = opener
+        self.chunkSize = chunkSize
+
+        # [start, end] of every section found so far by (tag, name), start is the byte offset of the start tag and end the
+        # offset of the end tag, end is None until the section is closed
+        self.sections = {}
+
+        # True once the whole file has been scanned
+        self.complete = False
+        self.scannedBytes = 0
+
+        self.scanFile = None
+        self.readFile = None
+        self.scanner = None
+        self.depth = 0
+        self.current = None
+
+    # Closes the files of the index
+    def close(self):
+
+        for xefFile in (self.scanFile, self.readFile):
+            if xefFile is not None:
+                xefFile.close()
+        self.scanFile = self.readFile = None
+
+    # Called by expat at the start of every element
+    def startElement(self, tag, attributes):
+
+        self.depth += 1
+
+        # Only the direct children of the root element are sections
+        if self.depth == 2 and tag in self.sectionNames:
+            nameAttribute = self.sectionNames[tag]
+            self.current = (tag, None if nameAttribute is None else attributes.get(nameAttribute))
+            self.sections.setdefault(self.current, [self.scanner.CurrentByteIndex, None])
+
+    # Called by expat at the end of every element
+    def endElement(self, tag):
+
+        if self.depth == 2 and self.current is not None:
+            self.sections[self.current][1] = self.scanner.CurrentByteIndex
+            self.current = None
+
+        self.depth -= 1
+
+    # Scans the next chunk of the file, returns False once the whole file has been scanned
+    # Raises ET.ParseError if the file is not valid XML
+    def scanChunk(self):
+
+        if self.complete:
+            return False
+
+        if self.scanner is None:
+            self.scanFile = self.opener()
+            self.scanner = expat.ParserCreate()
+            self.scanner.StartElementHandler = self.startElement
+            self.scanner.EndElementHandler = self.endElement
+
+        chunk = self.scanFile.read(self.chunkSize)
+        self.scannedBytes += len(chunk)
+
+        try:
+            self.scanner.Parse(chunk, len(chunk) == 0)
+        except expat.ExpatError as e:
+            raise ET.ParseError(str(e)) from e
+
+        if len(chunk) == 0:
+            self.complete = True
+            self.scanFile.close()
+            self.scanFile = None
+
+        return True
+
+    # Returns the [start, end] offsets of a section, scanning on until it is found, or None if it is not in the file
+    def find(self, tag, name = None):
+
+        key = (tag, name)
+        while (key not in self.sections or self.sections[key][1] is None) and self.scanChunk():
+            pass
+
+        return self.sections.get(key)
+
+    # Parses a single section and returns its element, or None if it is not in the file
+    # Raises ET.ParseError if the section is not valid XML
+    def read(self, tag, name = None):
+
+        section = self.find(tag, name)
+        if section is None:
+            return None
+
+        start, end = section
+
+        if self.readFile is None:
+            self.readFile = self.opener()
+        self.readFile.seek(start)
+
+        # Parse the section up to its end tag, the rest of the file is never read
+        # An empty section (<DDTSource ... />) is already complete at its end offset, otherwise its end tag is added
+        parser = ET.XMLPullParser(events = ('start', 'end'))
+        root = None
+        closed = False
+        remaining = end - start
+
+        while remaining > 0:
+            chunk = self.readFile.read(min(self.chunkSize, remaining))
+            if len(chunk) == 0:
+                raise ET.ParseError("Section " + tag + " ends before its end tag")
+            remaining -= len(chunk)
+            parser.feed(chunk)
+
+            for event, elem in parser.read_events():
+                if root is None:
+                    root = elem
+                elif event == 'end' and elem is root:
+                    closed = True
+
+        if not closed:
+            parser.feed(b'</' + tag.encode() + b'>')
+        parser.close()
+
+        return root
+
+# Memory layouts of the types of a project, every type is resolved once and then shared by all its variables
+# The fields of a structure follow each other in the order they are declared, every field that is not one byte long
+# starts on a word and a structure takes a whole number of words
+class TypeLayouts:
+
+    # Initialize class
+    def __init__(self, index):
+
+        self.index = index
+        self.layouts = {}
+
+        # Number of DDT and FB sections that were parsed
+        self.sectionsRead = 0
+
+    # Returns the layout of a type, or None if the type cannot be resolved
+    # Raises ET.ParseError if the section of the type is not valid XML
+    def layout(self, typeName):
+
+        if typeName in self.layouts:
+            return self.layouts[typeName]
+
+        # A type that refers back to itself cannot be resolved
+        self.layouts[typeName] = None
+        self.layouts[typeName] = layout = self.resolve(typeName)
+
+        return layout
+
+    # Returns True if the type is an array or a structure or function block defined in a DDT or FB section of the file
+    # Any other type is not expanded, the scan stops as soon as the section of the type is found
+    def isStructured(self, typeName):
+
+        typeName = typeName.strip()
+        if arrayPattern.match(typeName) is not None:
+            return True
+
+        return self.index.find('DDTSource', typeName) is not None or self.index.find('FBSource', typeName) is not None
+
+    # Resolves the layout of a type
+    def resolve(self, typeName):
+
+        typeName = typeName.strip()
+
+        # Elementary types are a single field
+        if typeName in typeSizes:
+            return TypeLayout(typeSizes[typeName], (Field('', typeName, 0, None, None),))
+
+        match = stringPattern.match(typeName)
+        if match is not None:
+            length = int(match.group(1) or 16)
+            return TypeLayout(length + length % 2, (Field('', typeName, 0, None, None),))
+
+        match = arrayPattern.match(typeName)
+        if match is not None:
+            return self.resolveArray(match.group(1), match.group(2))
+
+        # Structures are defined in a DDT section, function blocks in an FB section
+        section = self.index.read('DDTSource', typeName)
+        if section is not None:
+            self.sectionsRead += 1
+            structure = section.find('structure')
+            return None if structure is None else self.resolveFields(structure.iterfind('variables'))
+
+        section = self.index.read('FBSource', typeName)
+        if section is not None:
+            self.sectionsRead += 1
+            return self.resolveFields(variable for child in section if child.tag in fbFieldSections
+                                      for variable in child.iterfind('variables'))
+
+        return None
+
+    # Resolves the layout of the fields of a structure or function block
+    # Returns None if a field cannot be resolved or there are no fields, so the variable is not exported without them
+    def resolveFields(self, variables):
+
+        fields = []
+        offset = 0
+
+        for variable in variables:
+            layout = self.layout(variable.get('typeName', ''))
+            if layout is None:
+                return None
+
+            # Read the comment and the CustomerString of the field
+            comment = None
+            customerString = None
+            for child in variable:
+                if child.tag == 'comment' and comment is None:
+                    comment = child.text
+                elif child.tag == 'attribute' and child.get('name') == 'CustomerString' and customerString is None:
+                    customerString = child.get('value', '')
+
+            offset = self.align(offset, layout)
+            name = variable.get('name')
+
+            for field in layout.fields:
+                fields.append(Field(name + fieldSeparator + field.path if field.path else name, field.typeName,
+                                    offset + field.offset, joinComments(comment, field.comment),
+                                    field.customerString if field.customerString is not None else customerString))
+            offset += layout.size
+
+        if len(fields) == 0:
+            return None
+
+        return TypeLayout(offset + offset % 2, tuple(fields))
+
+    # Resolves the layout of an array, elements are named by their index (VALUES_0, VALUES_1, ...)
+    def resolveArray(self, dimensions, elementType):
+
+        layout = self.layout(elementType)
+        if layout is None:
+            return None
+
+        # Indexes of every dimension, the last index changes fastest
+        indexes = [[]]
+        for dimension in dimensions.split(','):
+            match = rangePattern.match(dimension)
+            if match is None:
+                return None
+            low, high = int(match.group(1)), int(match.group(2))
+            indexes = [index + [i] for index in indexes for i in range(low, high + 1)]
+
+        fields = []
+        step = self.align(layout.size, layout)
+        for position, index in enumerate(indexes):
+            path = fieldSeparator.join(str(i) for i in index)
+            for field in layout.fields:
+                fields.append(Field(path + fieldSeparator + field.path if field.path else path, field.typeName,
+                                    position * step + field.offset, field.comment, field.customerString))
+
+        return TypeLayout(len(indexes) * step + len(indexes) * step % 2, tuple(fields))
+
+    # Moves an offset to the next word unless the type is a single byte
+    @staticmethod
+    def align(offset, layout):
+        return offset if layout.size == 1 else offset + offset % 2